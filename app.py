@@ -1,777 +1,2842 @@
-import streamlit as st
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import pandas as pd
-from google.cloud import vision
-import io
-from datetime import datetime, timedelta
-import re
-
-# ページの設定
-st.set_page_config(
-    page_title="おうち在庫管理",
-    layout="wide",
-    initial_sidebar_state="collapsed"
-)
-
-# パステルカラーとスタイリッシュなCSS
-st.markdown("""
-<style>
-    /* Streamlitのヘッダーとフッターを非表示 */
-    header[data-testid="stHeader"] {
-        display: none;
-    }
-    
-    .stDeployButton {
-        display: none;
-    }
-    
-    footer {
-        display: none;
-    }
-    
-    #MainMenu {
-        display: none;
-    }
-    
-    /* 全体の背景を白に */
-    .stApp {
-        background-color: #ffffff;
-    }
-    
-    /* 全体のフォント調整 */
-    html, body, [class*="css"] {
-        font-family: 'Helvetica Neue', Arial, 'Hiragino Kaku Gothic ProN', 'Hiragino Sans', Meiryo, sans-serif;
-        font-size: 14px;
-    }
-    
-    /* コンパクトなヘッダー */
-    .app-header {
-        background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
-        padding: 0.9rem 1rem;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-    }
-    
-    .app-title {
-        color: white;
-        font-size: 1.1rem;
-        font-weight: 700;
-        margin: 0;
-        letter-spacing: 0.3px;
-    }
-    
-    .app-subtitle {
-        color: rgba(255,255,255,0.9);
-        font-size: 0.8rem;
-        margin-top: 0.25rem;
-        font-weight: 500;
-    }
-    
-    /* 統計カード */
-    .stats-container {
-        display: grid;
-        grid-template-columns: repeat(3, 1fr);
-        gap: 0.75rem;
-        margin-bottom: 1.5rem;
-    }
-    
-    .stat-card {
-        background: white;
-        padding: 0.75rem;
-        border-radius: 8px;
-        box-shadow: 0 1px 4px rgba(0,0,0,0.1);
-        text-align: center;
-        border: 1px solid #e5e7eb;
-    }
-    
-    .stat-value {
-        font-size: 1.5rem;
-        font-weight: 700;
-        margin: 0;
-    }
-    
-    .stat-label {
-        font-size: 0.65rem;
-        color: #6b7280;
-        margin-top: 0.15rem;
-        font-weight: 500;
-    }
-    
-    .stat-ok { color: #10b981; }
-    .stat-warning { color: #f59e0b; }
-    .stat-danger { color: #ef4444; }
-    
-    /* カテゴリバッジ - パステルカラー */
-    .category-badge {
-        display: inline-block;
-        padding: 0.2rem 0.5rem;
-        border-radius: 12px;
-        font-size: 0.7rem;
-        font-weight: 600;
-        margin-right: 0.5rem;
-    }
-    
-    .category-食料品 { background-color: #D4EDDA; color: #155724; }
-    .category-日用品 { background-color: #D1ECF1; color: #0C5460; }
-    .category-ベビー用品 { background-color: #F8D7DA; color: #721C24; }
-    .category-調味料 { background-color: #FFF3CD; color: #856404; }
-    
-    /* アイテムカード */
-    .item-row-inline {
-        background: white;
-        border-radius: 10px;
-        padding: 0.85rem 1rem;
-        box-shadow: 0 1px 3px rgba(0,0,0,0.08);
-        border: 1px solid #e5e7eb;
-        margin-bottom: 0.5rem;
-    }
-    
-    .item-name {
-        font-size: 0.95rem;
-        font-weight: 600;
-        margin-bottom: 0.2rem;
-        color: #1f2937;
-    }
-    
-    .item-stock {
-        font-size: 0.7rem;
-        color: #6b7280;
-    }
-    
-    .expiry-alert {
-        font-size: 0.7rem;
-        color: #dc3545;
-        font-weight: 600;
-    }
-    
-    .expiry-warning {
-        font-size: 0.7rem;
-        color: #f59e0b;
-        font-weight: 600;
-    }
-    
-    /* カラム間の余白を調整 */
-    div[data-testid="column"] {
-        padding: 0 0.25rem;
-    }
-    
-    div[data-testid="column"]:first-child {
-        padding-left: 0;
-    }
-    
-    div[data-testid="column"]:last-child {
-        padding-right: 0;
-    }
-    
-    /* 検索バー */
-    .stTextInput > div > div > input {
-        border-radius: 8px;
-        border: 1px solid #d1d5db;
-        padding: 0.6rem 1rem;
-        font-size: 0.9rem;
-    }
-    
-    .stTextInput > div > div > input:focus {
-        border-color: #6b7280;
-        box-shadow: 0 0 0 2px rgba(107, 114, 128, 0.1);
-    }
-    
-    /* ボタン調整 */
-    .stButton > button {
-        border-radius: 8px;
-        font-weight: 600;
-        font-size: 0.85rem;
-        padding: 0.5rem 1rem;
-        border: 1px solid #d1d5db;
-        background-color: white !important;
-        color: #374151 !important;
-        transition: all 0.2s;
-    }
-    
-    .stButton > button:hover {
-        background-color: #f9fafb !important;
-        border-color: #9ca3af;
-    }
-    
-    .stButton > button:active {
-        transform: scale(0.95);
-    }
-    
-    /* タブのスタイル改善 */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 0.3rem;
-        background: white;
-        border-radius: 8px;
-        padding: 0.3rem;
-        margin-bottom: 1rem;
-        border: 1px solid #e5e7eb;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        border-radius: 6px;
-        font-size: 0.85rem;
-        font-weight: 600;
-        padding: 0.5rem 1rem;
-        color: #6b7280;
-    }
-    
-    .stTabs [data-baseweb="tab"][aria-selected="true"] {
-        background-color: #667eea;
-        color: white;
-    }
-    
-    /* 余白調整 */
-    .block-container {
-        padding-top: 1.5rem;
-        padding-bottom: 2rem;
-        max-width: 800px;
-    }
-    
-    /* ラジオボタン */
-    .stRadio > label {
-        font-size: 0.8rem;
-        font-weight: 600;
-    }
-    
-    .stRadio div[role="radiogroup"] label {
-        color: #1f2937 !important;
-    }
-    
-    .stRadio div[role="radiogroup"] label p {
-        color: #1f2937 !important;
-    }
-    
-    /* 買い物リストアイテム */
-    .shopping-item {
-        background: #fef3c7;
-        border: 1px solid #fcd34d;
-        padding: 0.75rem;
-        border-radius: 8px;
-        margin-bottom: 0.5rem;
-    }
-    
-    .shopping-item-name {
-        font-weight: 600;
-        font-size: 0.9rem;
-        color: #92400e;
-    }
-    
-    .shopping-item-detail {
-        font-size: 0.7rem;
-        color: #b45309;
-        margin-top: 0.2rem;
-    }
-    
-    .manual-item {
-        background: #E3F2FD;
-        border: 1px solid #90CAF9;
-        padding: 0.75rem;
-        border-radius: 8px;
-        margin-bottom: 0.5rem;
-    }
-    
-    .manual-item-name {
-        font-weight: 600;
-        font-size: 0.9rem;
-        color: #1565C0;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Google Sheets接続
-@st.cache_resource
-def get_google_sheet():
-    try:
-        scope = [
-            'https://spreadsheets.google.com/feeds',
-            'https://www.googleapis.com/auth/drive'
-        ]
-        
-        creds_dict = {
-            "type": st.secrets["gsheets"]["type"],
-            "project_id": st.secrets["gsheets"]["project_id"],
-            "private_key_id": st.secrets["gsheets"]["private_key_id"],
-            "private_key": st.secrets["gsheets"]["private_key"],
-            "client_email": st.secrets["gsheets"]["client_email"],
-            "client_id": st.secrets["gsheets"]["client_id"],
-            "auth_uri": st.secrets["gsheets"]["auth_uri"],
-            "token_uri": st.secrets["gsheets"]["token_uri"],
-            "auth_provider_x509_cert_url": st.secrets["gsheets"]["auth_provider_x509_cert_url"],
-            "client_x509_cert_url": st.secrets["gsheets"]["client_x509_cert_url"]
-        }
-        
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        
-        sheet_url = "https://docs.google.com/spreadsheets/d/1xLJxgm9SxveTBPJz1swAygGrc4zdoAD1GoRMLLaNgs0/edit?usp=sharing"
-        sheet = client.open_by_url(sheet_url).sheet1
-        
-        return sheet
-    except Exception as e:
-        st.error(f"接続エラー: {e}")
-        return None
-
-def load_data(sheet):
-    try:
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
-        
-        # 必要な列を確保
-        required_columns = ['アイコン', '項目名', 'カテゴリ', '在庫数', '予備数', '補充しきい値', '賞味期限']
-        for col in required_columns:
-            if col not in df.columns:
-                df[col] = ''
-        
-        # 数値型に変換
-        df['在庫数'] = pd.to_numeric(df['在庫数'], errors='coerce').fillna(0).astype(int)
-        df['予備数'] = pd.to_numeric(df['予備数'], errors='coerce').fillna(0).astype(int)
-        df['補充しきい値'] = pd.to_numeric(df['補充しきい値'], errors='coerce').fillna(0).astype(int)
-        
-        return df
-    except Exception as e:
-        st.error(f"データ読み込みエラー: {e}")
-        return None
-
-def update_data(sheet, df):
-    try:
-        data = [df.columns.tolist()] + df.values.tolist()
-        sheet.clear()
-        sheet.update(data, 'A1')
-        return True
-    except Exception as e:
-        st.error(f"更新エラー: {e}")
-        return False
-
-# Vision API関数
-def detect_text_from_image(image_bytes):
-    """レシート画像からテキストを抽出"""
-    try:
-        api_key = st.secrets["google_vision"]["api_key"]
-        client = vision.ImageAnnotatorClient(client_options={"api_key": api_key})
-        
-        image = vision.Image(content=image_bytes)
-        response = client.text_detection(image=image)
-        texts = response.text_annotations
-        
-        if texts:
-            return texts[0].description
-        else:
-            return ""
-    except Exception as e:
-        st.error(f"Vision APIエラー: {e}")
-        return ""
-
-def parse_receipt_text(text, df):
-    """レシートのテキストから商品を抽出"""
-    detected_items = []
-    lines = text.split('\n')
-    registered_items = df['項目名'].tolist()
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        for item_name in registered_items:
-            if item_name in line:
-                numbers = re.findall(r'\d+', line)
-                quantity = int(numbers[0]) if numbers else 1
-                
-                if not any(d['name'] == item_name for d in detected_items):
-                    detected_items.append({'name': item_name, 'quantity': quantity})
-                break
-    
-    return detected_items
-
-def check_expiry_status(expiry_date):
-    """賞味期限のステータスをチェック"""
-    if not expiry_date or expiry_date == '':
-        return None
-    
-    try:
-        expiry = datetime.strptime(str(expiry_date), '%Y-%m-%d')
-        today = datetime.now()
-        days_left = (expiry - today).days
-        
-        if days_left < 0:
-            return 'expired'
-        elif days_left <= 3:
-            return 'critical'
-        elif days_left <= 7:
-            return 'warning'
-        else:
-            return 'ok'
-    except:
-        return None
-
-# セッション状態の初期化
-if 'manual_shopping_list' not in st.session_state:
-    st.session_state.manual_shopping_list = []
-
-if 'low_stock_items' not in st.session_state:
-    st.session_state.low_stock_items = []
-
-# ヘッダー
-st.markdown("""
-<div class="app-header">
-    <div class="app-title">🏠 おうち在庫管理システム</div>
-    <div class="app-subtitle">いつでも、どこでも、在庫チェック</div>
-</div>
-""", unsafe_allow_html=True)
-
-# メイン処理
-try:
-    sheet = get_google_sheet()
-    
-    if sheet is None:
-        st.error("Google Sheetsに接続できませんでした")
-        st.stop()
-    
-    df = load_data(sheet)
-    
-    if df is None or df.empty:
-        st.warning("データが見つかりませんでした")
-        st.stop()
-    
-    # 統計情報の計算
-    total_items = len(df)
-    critical_items = len(df[df['予備数'] == 0])
-    warning_items = len(df[(df['予備数'] > 0) & (df['予備数'] < df['補充しきい値'])])
-    ok_items = len(df[df['予備数'] >= df['補充しきい値']])
-    
-    # 統計情報 - 横並び
-    st.markdown(f"""
-    <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 0.75rem; margin-bottom: 1.5rem;">
-        <div class="stat-card">
-            <div class="stat-value stat-ok">{ok_items}</div>
-            <div class="stat-label">在庫OK</div>
-        </div>
-        <div class="stat-card">
-            <div class="stat-value stat-warning">{warning_items}</div>
-            <div class="stat-label">要注意</div>
-        </div>
-        <div class="stat-card">
-            <div class="stat-value stat-danger">{critical_items}</div>
-            <div class="stat-label">在庫切れ</div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # タブ
-    tab1, tab2, tab3 = st.tabs(["📦 在庫一覧", "🛒 買うものリスト", "📸 レシート読み取り"])
-    
-    # タブ1: 在庫一覧
-    with tab1:
-        # 新規追加ボタン
-        if st.button("➕ 新しいアイテムを追加", use_container_width=True):
-            st.session_state.show_add_form = True
-        
-        # 新規追加フォーム
-        if st.session_state.get('show_add_form', False):
-            with st.form("add_item_form"):
-                st.markdown("### 新しいアイテムを追加")
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    new_icon = st.text_input("アイコン(絵文字)", placeholder="🍶")
-                    new_name = st.text_input("項目名", placeholder="醤油")
-                    new_category = st.text_input("カテゴリ", placeholder="調味料")
-                
-                with col2:
-                    new_stock = st.number_input("在庫数", min_value=0, value=0)
-                    new_threshold = st.number_input("在庫下限", min_value=0, value=1)
-                    new_expiry = st.text_input("賞味期限(YYYY-MM-DD)", placeholder="2026-12-31")
-                
-                col_btn1, col_btn2 = st.columns(2)
-                with col_btn1:
-                    submit = st.form_submit_button("追加", use_container_width=True)
-                with col_btn2:
-                    cancel = st.form_submit_button("キャンセル", use_container_width=True)
-                
-                if submit and new_name:
-                    new_row = {
-                        'アイコン': new_icon,
-                        '項目名': new_name,
-                        'カテゴリ': new_category,
-                        '在庫数': new_stock,
-                        '予備数': new_stock,
-                        '補充しきい値': new_threshold,
-                        '賞味期限': new_expiry
-                    }
-                    df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-                    if update_data(sheet, df):
-                        st.success(f"✓ {new_name}を追加しました!")
-                        st.session_state.show_add_form = False
-                        st.rerun()
-                
-                if cancel:
-                    st.session_state.show_add_form = False
-                    st.rerun()
-        
-        st.divider()
-        
-        # 検索バーとフィルター
-        search_query = st.text_input("🔍 検索", placeholder="項目名で検索...", label_visibility="collapsed")
-        
-        col_filter1, col_filter2 = st.columns(2)
-        
-        with col_filter1:
-            categories = ['すべて'] + sorted(df['カテゴリ'].unique().tolist())
-            category_filter = st.selectbox("カテゴリー", categories, label_visibility="collapsed", key="category_filter")
-        
-        with col_filter2:
-            filter_option = st.radio("表示", ["すべて", "要補充", "在庫OK"], horizontal=True, label_visibility="collapsed")
-        
-        # フィルター適用
-        display_df = df.copy()
-        
-        # カテゴリ順にソート
-        display_df = display_df.sort_values('カテゴリ')
-        
-        if search_query:
-            display_df = display_df[display_df['項目名'].str.contains(search_query, case=False, na=False)]
-        
-        if category_filter != 'すべて':
-            display_df = display_df[display_df['カテゴリ'] == category_filter]
-        
-        if filter_option == "要補充":
-            display_df = display_df[display_df['予備数'] < display_df['補充しきい値']]
-        elif filter_option == "在庫OK":
-            display_df = display_df[display_df['予備数'] >= display_df['補充しきい値']]
-        
-        if display_df.empty:
-            st.info("表示するアイテムがありません")
-        else:
-            for index, row in display_df.iterrows():
-                current_stock = int(row['予備数'])
-                threshold = int(row['補充しきい値'])
-                icon = row.get('アイコン', '')
-                category = row.get('カテゴリ', '')
-                expiry = row.get('賞味期限', '')
-                
-                # 賞味期限チェック
-                expiry_status = check_expiry_status(expiry) if category == '食料品' else None
-                
-                # 横並びレイアウト
-                col1, col2, col3, col4 = st.columns([4, 1.2, 0.9, 0.9])
-                
-                with col1:
-                    category_class = f"category-{category}" if category else ""
-                    category_badge = f'<span class="category-badge {category_class}">{category}</span>' if category else ''
-                    
-                    expiry_html = ""
-                    if expiry_status == 'expired':
-                        expiry_html = f'<div class="expiry-alert">⚠️ 期限切れ</div>'
-                    elif expiry_status == 'critical':
-                        expiry_html = f'<div class="expiry-alert">⚠️ 期限まであと{(datetime.strptime(str(expiry), "%Y-%m-%d") - datetime.now()).days}日</div>'
-                    elif expiry_status == 'warning':
-                        expiry_html = f'<div class="expiry-warning">期限まであと{(datetime.strptime(str(expiry), "%Y-%m-%d") - datetime.now()).days}日</div>'
-                    
-                    st.markdown(f"""
-                    <div class="item-row-inline">
-                        <div class="item-name">{icon} {category_badge}{row['項目名']}</div>
-                        <div class="item-stock">在庫: {current_stock}個 / 在庫下限: {threshold}個</div>
-                        {expiry_html}
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    if st.button("残りわずか", key=f"low_{index}", use_container_width=True):
-                        if row['項目名'] not in st.session_state.low_stock_items:
-                            st.session_state.low_stock_items.append(row['項目名'])
-                            st.success("買うものリストに追加!")
-                            st.rerun()
-                
-                with col3:
-                    if st.button("➖", key=f"minus_{index}", use_container_width=True):
-                        df.at[index, '予備数'] = max(0, current_stock - 1)
-                        if update_data(sheet, df):
-                            st.rerun()
-                
-                with col4:
-                    if st.button("➕", key=f"plus_{index}", use_container_width=True):
-                        df.at[index, '予備数'] = current_stock + 1
-                        if update_data(sheet, df):
-                            st.rerun()
-    
-    # タブ2: 買うものリスト
-    with tab2:
-        # 単発追加フォーム
-        with st.form("manual_add", clear_on_submit=True):
-            st.markdown("### 📝 単発で追加")
-            col1, col2 = st.columns([4, 1])
-            with col1:
-                manual_item = st.text_input("買うもの", placeholder="ティッシュ、シャンプーなど...", label_visibility="collapsed")
-            with col2:
-                add_manual = st.form_submit_button("追加", use_container_width=True)
-            
-            if add_manual and manual_item:
-                if manual_item not in st.session_state.manual_shopping_list:
-                    st.session_state.manual_shopping_list.append(manual_item)
-                    st.success(f"✓ {manual_item}を追加しました!")
-                    st.rerun()
-        
-        st.divider()
-        
-        # 在庫切れアイテム
-        to_buy = df[df['予備数'] < df['補充しきい値']].copy()
-        
-        # 残りわずかアイテム
-        low_stock_df = df[df['項目名'].isin(st.session_state.low_stock_items)]
-        
-        total_items_to_buy = len(to_buy) + len(low_stock_df) + len(st.session_state.manual_shopping_list)
-        
-        if total_items_to_buy > 0:
-            st.markdown(f'<h3 style="color: #1f2937;">買うものリスト ({total_items_to_buy}個)</h3>', unsafe_allow_html=True)
-            
-            # 在庫切れ
-            if not to_buy.empty:
-                st.markdown('<h4 style="color: #1f2937;">📦 在庫切れ</h4>', unsafe_allow_html=True)
-                for idx, (index, row) in enumerate(to_buy.iterrows(), 1):
-                    shortage = int(row['補充しきい値']) - int(row['予備数'])
-                    icon = row.get('アイコン', '')
-                    
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f"""
-                        <div class="shopping-item">
-                            <div class="shopping-item-name">{icon} {row['項目名']}</div>
-                            <div class="shopping-item-detail">現在 {row['予備数']}個 → あと{shortage}個必要</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col2:
-                        if st.button("✓", key=f"bought_{index}", use_container_width=True):
-                            df.at[index, '予備数'] = int(row['補充しきい値'])
-                            if update_data(sheet, df):
-                                st.success("✓")
-                                st.rerun()
-            
-            # 残りわずか
-            if not low_stock_df.empty:
-                st.markdown('<h4 style="color: #1f2937;">⚠️ 残りわずか</h4>', unsafe_allow_html=True)
-                for idx, (index, row) in enumerate(low_stock_df.iterrows(), 1):
-                    icon = row.get('アイコン', '')
-                    
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f"""
-                        <div class="shopping-item">
-                            <div class="shopping-item-name">{icon} {row['項目名']}</div>
-                            <div class="shopping-item-detail">在庫: {row['予備数']}個</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col2:
-                        if st.button("削除", key=f"remove_low_{index}", use_container_width=True):
-                            st.session_state.low_stock_items.remove(row['項目名'])
-                            st.rerun()
-            
-            # 単発追加アイテム
-            if st.session_state.manual_shopping_list:
-                st.markdown('<h4 style="color: #1f2937;">📝 単発メモ</h4>', unsafe_allow_html=True)
-                for idx, item in enumerate(st.session_state.manual_shopping_list):
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f"""
-                        <div class="manual-item">
-                            <div class="manual-item-name">📌 {item}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col2:
-                        if st.button("削除", key=f"remove_manual_{idx}", use_container_width=True):
-                            st.session_state.manual_shopping_list.remove(item)
-                            st.rerun()
-            
-            # コピー用リスト
-            with st.expander("📋 コピー用リスト"):
-                all_items = []
-                for _, row in to_buy.iterrows():
-                    all_items.append(f"□ {row['項目名']}")
-                for _, row in low_stock_df.iterrows():
-                    all_items.append(f"□ {row['項目名']}")
-                for item in st.session_state.manual_shopping_list:
-                    all_items.append(f"□ {item}")
-                
-                shopping_list = "\n".join(all_items)
-                st.text_area("", shopping_list, height=200, label_visibility="collapsed")
-        else:
-            st.success("🎉 すべての在庫が十分です!")
-    
-    # タブ3: レシート読み取り
-    with tab3:
-        st.markdown('<h3 style="color: #1f2937;">📸 レシートを撮影して自動補充</h3>', unsafe_allow_html=True)
-        st.info("レシートの写真をアップロードすると、購入した商品を自動で判別して在庫を補充します")
-        
-        uploaded_file = st.file_uploader("レシートの写真を選択", type=["jpg", "jpeg", "png"], label_visibility="collapsed")
-        
-        if uploaded_file is not None:
-            col1, col2 = st.columns([1, 1])
-            with col1:
-                st.image(uploaded_file, caption="アップロードされたレシート", use_container_width=True)
-            
-            with col2:
-                st.markdown('<h4 style="color: #1f2937;">🔍 解析中...</h4>', unsafe_allow_html=True)
-                
-                with st.spinner("レシートを読み取っています..."):
-                    image_bytes = uploaded_file.read()
-                    receipt_text = detect_text_from_image(image_bytes)
-                    
-                    if receipt_text:
-                        st.success("✅ 読み取り完了!")
-                        
-                        with st.expander("📄 読み取ったテキスト"):
-                            st.text(receipt_text)
-                        
-                        detected_items = parse_receipt_text(receipt_text, df)
-                        
-                        if detected_items:
-                            st.markdown('<h4 style="color: #1f2937;">検出された商品:</h4>', unsafe_allow_html=True)
-                            
-                            for item in detected_items:
-                                exact_match = df[df['項目名'] == item['name']]
-                                
-                                if not exact_match.empty:
-                                    item_index = exact_match.index[0]
-                                    col_a, col_b = st.columns([3, 1])
-                                    
-                                    with col_a:
-                                        st.markdown(f'<div style="color: #1f2937;"><strong>{item["name"]}</strong> ({item["quantity"]}個) ✓ 完全一致</div>', unsafe_allow_html=True)
-                                    
-                                    with col_b:
-                                        if st.button("追加", key=f"add_{item['name']}", use_container_width=True):
-                                            current = int(df.at[item_index, '予備数'])
-                                            df.at[item_index, '予備数'] = current + item['quantity']
-                                            if update_data(sheet, df):
-                                                st.success(f"✓ {item['name']}を追加しました!")
-                                                st.rerun()
-                        else:
-                            st.warning("⚠️ 登録されている商品が見つかりませんでした")
-                    else:
-                        st.error("❌ テキストを読み取れませんでした。もう一度試してください。")
-        else:
-            st.markdown("""
-            <div style="color: #1f2937;">
-            
-            ### 📱 使い方
-            
-            1. **レシートを撮影**してアップロード
-            2. **自動で商品名を検出**
-            3. **「追加」ボタン**で在庫を補充
-            
-            #### 💡 ヒント
-            - レシート全体が写るように撮影してください
-            - 明るい場所で撮影するとより正確です
-            - 商品名が在庫リストに登録されている必要があります
-            
-            </div>
-            """, unsafe_allow_html=True)
-
-except Exception as e:
-    st.error("エラーが発生しました")
-    with st.expander("詳細"):
-        st.code(str(e))
\ No newline at end of file
+import streamlit as st
+import pandas as pd
+import numpy as np
+import io
+import hashlib
+import heapq
+import hmac
+import json
+import unicodedata
+import sqlite3
+from collections import Counter, OrderedDict, defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from datetime import datetime, timedelta
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ページの設定
+st.set_page_config(
+    page_title="おうち在庫管理",
+    layout="wide",
+    initial_sidebar_state="collapsed"
+)
+
+# パステルカラーとスタイリッシュなCSS
+st.markdown("""
+<style>
+    /* Streamlitのヘッダーとフッターを非表示 */
+    header[data-testid="stHeader"] {
+        display: none;
+    }
+    
+    .stDeployButton {
+        display: none;
+    }
+    
+    footer {
+        display: none;
+    }
+    
+    #MainMenu {
+        display: none;
+    }
+    
+    /* 全体の背景を白に */
+    .stApp {
+        background-color: #ffffff;
+    }
+    
+    /* 全体のフォント調整 */
+    html, body, [class*="css"] {
+        font-family: 'Helvetica Neue', Arial, 'Hiragino Kaku Gothic ProN', 'Hiragino Sans', Meiryo, sans-serif;
+        font-size: 14px;
+    }
+    
+    /* コンパクトなヘッダー */
+    .app-header {
+        background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
+        padding: 0.9rem 1rem;
+        border-radius: 10px;
+        text-align: center;
+        margin-bottom: 1rem;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+    }
+    
+    .app-title {
+        color: white;
+        font-size: 1.1rem;
+        font-weight: 700;
+        margin: 0;
+        letter-spacing: 0.3px;
+    }
+    
+    .app-subtitle {
+        color: rgba(255,255,255,0.9);
+        font-size: 0.8rem;
+        margin-top: 0.25rem;
+        font-weight: 500;
+    }
+    
+    /* 統計カード */
+    .stats-container {
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 0.75rem;
+        margin-bottom: 1.5rem;
+    }
+    
+    .stat-card {
+        background: white;
+        padding: 0.75rem;
+        border-radius: 8px;
+        box-shadow: 0 1px 4px rgba(0,0,0,0.1);
+        text-align: center;
+        border: 1px solid #e5e7eb;
+    }
+    
+    .stat-value {
+        font-size: 1.5rem;
+        font-weight: 700;
+        margin: 0;
+    }
+    
+    .stat-label {
+        font-size: 0.65rem;
+        color: #6b7280;
+        margin-top: 0.15rem;
+        font-weight: 500;
+    }
+    
+    .stat-ok { color: #10b981; }
+    .stat-warning { color: #f59e0b; }
+    .stat-danger { color: #ef4444; }
+    
+    /* カテゴリバッジ - パステルカラー */
+    .category-badge {
+        display: inline-block;
+        padding: 0.2rem 0.5rem;
+        border-radius: 12px;
+        font-size: 0.7rem;
+        font-weight: 600;
+        margin-right: 0.5rem;
+    }
+    
+    .category-食料品 { background-color: #D4EDDA; color: #155724; }
+    .category-日用品 { background-color: #D1ECF1; color: #0C5460; }
+    .category-ベビー用品 { background-color: #F8D7DA; color: #721C24; }
+    .category-調味料 { background-color: #FFF3CD; color: #856404; }
+    
+    /* アイテムカード */
+    .item-row-inline {
+        background: white;
+        border-radius: 10px;
+        padding: 0.85rem 1rem;
+        box-shadow: 0 1px 3px rgba(0,0,0,0.08);
+        border: 1px solid #e5e7eb;
+        margin-bottom: 0.5rem;
+    }
+    
+    .item-name {
+        font-size: 0.95rem;
+        font-weight: 600;
+        margin-bottom: 0.2rem;
+        color: #1f2937;
+    }
+    
+    .item-stock {
+        font-size: 0.7rem;
+        color: #6b7280;
+    }
+    
+    .expiry-alert {
+        font-size: 0.7rem;
+        color: #dc3545;
+        font-weight: 600;
+    }
+    
+    .expiry-warning {
+        font-size: 0.7rem;
+        color: #f59e0b;
+        font-weight: 600;
+    }
+    
+    /* カラム間の余白を調整 */
+    div[data-testid="column"] {
+        padding: 0 0.25rem;
+    }
+    
+    div[data-testid="column"]:first-child {
+        padding-left: 0;
+    }
+    
+    div[data-testid="column"]:last-child {
+        padding-right: 0;
+    }
+    
+    /* 検索バー */
+    .stTextInput > div > div > input {
+        border-radius: 8px;
+        border: 1px solid #d1d5db;
+        padding: 0.6rem 1rem;
+        font-size: 0.9rem;
+    }
+    
+    .stTextInput > div > div > input:focus {
+        border-color: #6b7280;
+        box-shadow: 0 0 0 2px rgba(107, 114, 128, 0.1);
+    }
+    
+    /* ボタン調整 */
+    .stButton > button {
+        border-radius: 8px;
+        font-weight: 600;
+        font-size: 0.85rem;
+        padding: 0.5rem 1rem;
+        border: 1px solid #d1d5db;
+        background-color: white !important;
+        color: #374151 !important;
+        transition: all 0.2s;
+    }
+    
+    .stButton > button:hover {
+        background-color: #f9fafb !important;
+        border-color: #9ca3af;
+    }
+    
+    .stButton > button:active {
+        transform: scale(0.95);
+    }
+    
+    /* タブのスタイル改善 */
+    .stTabs [data-baseweb="tab-list"] {
+        gap: 0.3rem;
+        background: white;
+        border-radius: 8px;
+        padding: 0.3rem;
+        margin-bottom: 1rem;
+        border: 1px solid #e5e7eb;
+    }
+    
+    .stTabs [data-baseweb="tab"] {
+        border-radius: 6px;
+        font-size: 0.85rem;
+        font-weight: 600;
+        padding: 0.5rem 1rem;
+        color: #6b7280;
+    }
+    
+    .stTabs [data-baseweb="tab"][aria-selected="true"] {
+        background-color: #667eea;
+        color: white;
+    }
+    
+    /* 余白調整 */
+    .block-container {
+        padding-top: 1.5rem;
+        padding-bottom: 2rem;
+        max-width: 800px;
+    }
+    
+    /* ラジオボタン */
+    .stRadio > label {
+        font-size: 0.8rem;
+        font-weight: 600;
+    }
+    
+    .stRadio div[role="radiogroup"] label {
+        color: #1f2937 !important;
+    }
+    
+    .stRadio div[role="radiogroup"] label p {
+        color: #1f2937 !important;
+    }
+    
+    /* 買い物リストアイテム */
+    .shopping-item {
+        background: #fef3c7;
+        border: 1px solid #fcd34d;
+        padding: 0.75rem;
+        border-radius: 8px;
+        margin-bottom: 0.5rem;
+    }
+    
+    .shopping-item-name {
+        font-weight: 600;
+        font-size: 0.9rem;
+        color: #92400e;
+    }
+    
+    .shopping-item-detail {
+        font-size: 0.7rem;
+        color: #b45309;
+        margin-top: 0.2rem;
+    }
+    
+    .manual-item {
+        background: #E3F2FD;
+        border: 1px solid #90CAF9;
+        padding: 0.75rem;
+        border-radius: 8px;
+        margin-bottom: 0.5rem;
+    }
+    
+    .manual-item-name {
+        font-weight: 600;
+        font-size: 0.9rem;
+        color: #1565C0;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+def get_config(section):
+    """secretsの任意設定セクションを返す(secretsファイルがなければ空)"""
+    try:
+        return st.secrets.get(section, {})
+    except FileNotFoundError:
+        return {}
+
+# 計測(secretsの debug.profile = true で有効)
+_NULL_SPAN = nullcontext()
+
+class Profiler:
+    """処理時間のスパンとAPI呼び出しを記録する計測器(無効時はほぼコストなし)"""
+    
+    def __init__(self, enabled=False, history=200, log_path=None):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.counters = Counter()
+        self._history = defaultdict(lambda: deque(maxlen=history))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def span(self, name):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name)
+    
+    @contextmanager
+    def _span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, (time.perf_counter() - start) * 1000)
+    
+    def count(self, name, payload=None):
+        """API呼び出し回数と送受信したデータ量(JSON換算のバイト数)を加算"""
+        if not self.enabled:
+            return
+        size = 0
+        if payload is not None:
+            size = payload if isinstance(payload, int) else len(json.dumps(payload, ensure_ascii=False, default=str).encode())
+        with self._lock:
+            self.counters[f"{name}.calls"] += 1
+            self.counters[f"{name}.bytes"] += size
+    
+    def start_rerun(self):
+        if not self.enabled:
+            return
+        self._local.spans = []
+        self._local.phase = None
+        self._local.started = time.perf_counter()
+    
+    def phase(self, name):
+        """描画フェーズの区切り(前のフェーズを閉じて次を開始)"""
+        if not self.enabled:
+            return
+        self._close_phase()
+        self._local.phase = (name, time.perf_counter())
+    
+    def end_rerun(self):
+        """再実行1回分の内訳を返す(debug.profile_log 指定時はJSON Linesで追記)"""
+        if not self.enabled or getattr(self._local, 'spans', None) is None:
+            return None
+        self._close_phase()
+        total = (time.perf_counter() - self._local.started) * 1000
+        spans, self._local.spans = self._local.spans, None
+        self._record('rerun', total)
+        
+        rerun = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'total_ms': round(total, 2),
+            'spans': spans,
+        }
+        
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(rerun, ensure_ascii=False) + '\n')
+        return rerun
+    
+    def percentiles(self):
+        """スパン名ごとの直近の件数とp50/p95(ミリ秒)"""
+        with self._lock:
+            history = {name: sorted(values) for name, values in self._history.items()}
+        return [
+            {
+                'name': name,
+                'count': len(values),
+                'p50': round(values[len(values) // 2], 2),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+            }
+            for name, values in sorted(history.items())
+        ]
+    
+    def _close_phase(self):
+        phase = getattr(self._local, 'phase', None)
+        if phase is not None:
+            name, start = phase
+            self._record(name, (time.perf_counter() - start) * 1000)
+            self._local.phase = None
+    
+    def _record(self, name, ms):
+        with self._lock:
+            self._history[name].append(ms)
+        spans = getattr(self._local, 'spans', None)
+        if spans is not None:
+            spans.append({'name': name, 'ms': round(ms, 2)})
+
+@st.cache_resource
+def get_profiler():
+    config = get_config("debug")
+    return Profiler(config.get("profile", False), log_path=config.get("profile_log"))
+
+# Google Sheets接続(gspread/oauth2client は接続するときに読み込む)
+DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/1xLJxgm9SxveTBPJz1swAygGrc4zdoAD1GoRMLLaNgs0/edit?usp=sharing"
+
+CREDENTIAL_KEYS = [
+    "type", "project_id", "private_key_id", "private_key", "client_email", "client_id",
+    "auth_uri", "token_uri", "auth_provider_x509_cert_url", "client_x509_cert_url"
+]
+
+@st.cache_resource
+def get_gspread_client(credentials="gsheets"):
+    """secretsの認証情報ごとにgspreadクライアントを1つだけ作成して共有"""
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    
+    scope = [
+        'https://spreadsheets.google.com/feeds',
+        'https://www.googleapis.com/auth/drive'
+    ]
+    
+    creds_dict = {key: st.secrets[credentials][key] for key in CREDENTIAL_KEYS}
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    return gspread.authorize(creds)
+
+def open_worksheet(sheet_url=DEFAULT_SHEET_URL, credentials="gsheets", worksheet=None):
+    try:
+        spreadsheet = get_gspread_client(credentials).open_by_url(sheet_url)
+        return spreadsheet.worksheet(worksheet) if worksheet else spreadsheet.sheet1
+    except Exception as e:
+        st.error(f"接続エラー: {e}")
+        return None
+
+# 在庫データの列
+INVENTORY_COLUMNS = ['アイコン', '項目名', 'カテゴリ', '在庫数', '予備数', '補充しきい値', '賞味期限']
+INTEGER_COLUMNS = ['在庫数', '予備数', '補充しきい値']
+
+# 買うものリストの列(種類は low=残りわずか / manual=単発メモ)
+SHOPPING_COLUMNS = ['種類', '項目名']
+
+def get_modified_time(sheet):
+    """スプレッドシートの最終更新日時を取得(取得できない場合はNone)"""
+    try:
+        spreadsheet = sheet.spreadsheet
+        if hasattr(spreadsheet, 'get_lastUpdateTime'):
+            return spreadsheet.get_lastUpdateTime()
+        return spreadsheet.lastUpdateTime
+    except Exception:
+        return None
+
+def records_to_values(records, columns=INVENTORY_COLUMNS):
+    """レコード(辞書のリスト)をヘッダー付きの2次元リストに変換"""
+    return [list(columns)] + [[record.get(col, '') for col in columns] for record in records]
+
+def values_to_records(values):
+    """ヘッダー付きの2次元リストをレコード(辞書のリスト)に変換"""
+    return [dict(zip(values[0], row)) for row in values[1:]]
+
+def project_to_sheet(records, sheet_values):
+    """在庫の列をシートの列順に並べた2次元リストを作成(在庫にない列はシートの値を残す)
+    
+    シートにない在庫の列は右端に追加する。残す値は同じ行位置の行、なければ同じ項目名の行から取る。
+    """
+    header = list(sheet_values[0]) + [col for col in INVENTORY_COLUMNS if col not in sheet_values[0]]
+    width = len(header)
+    positions = [(header.index(col), col) for col in INVENTORY_COLUMNS]
+    name_position = header.index('項目名')
+    
+    sheet_rows = [list(row) + [''] * (width - len(row)) for row in sheet_values[1:]]
+    by_name = {}
+    for row in sheet_rows:
+        by_name.setdefault(row[name_position], row)
+    
+    rows = []
+    for i, record in enumerate(records):
+        name = record.get('項目名', '')
+        if i < len(sheet_rows) and sheet_rows[i][name_position] == name:
+            row = list(sheet_rows[i])
+        else:
+            row = list(by_name.get(name, [''] * width))
+        for position, col in positions:
+            row[position] = record.get(col, '')
+        rows.append(row)
+    return [header] + rows
+
+def _is_retryable_error(error):
+    """クォータ超過や一時的なサーバーエラーかどうか"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) in (429, 500, 502, 503)
+
+class GoogleSheetStore:
+    """Google Sheetsのワークシートに在庫を保存するストレージ"""
+    
+    name = 'Google Sheets'
+    shopping_title = '買うものリスト'
+    
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._shopping_sheet = None
+    
+    def fetch_records(self):
+        profiler = get_profiler()
+        with profiler.span('sheets.get_all_records'):
+            records = self.sheet.get_all_records()
+        profiler.count('sheets.read', records)
+        return records
+    
+    def version(self):
+        profiler = get_profiler()
+        with profiler.span('sheets.modified_time'):
+            modified_time = get_modified_time(self.sheet)
+        profiler.count('sheets.modified_time')
+        return modified_time
+    
+    def write(self, old_values, new_values):
+        """スナップショットとの差分だけを書き込む"""
+        profiler = get_profiler()
+        if old_values is None or old_values[0] != new_values[0] or len(new_values) < len(old_values):
+            # 列構成の変更や行削除がある場合のみ全体を書き直す
+            with profiler.span('sheets.rewrite'):
+                self.sheet.clear()
+                self.sheet.update(new_values, 'A1')
+            profiler.count('sheets.write', new_values)
+        else:
+            updates = diff_sheet_values(old_values, new_values)
+            if updates:
+                with profiler.span('sheets.batch_update'):
+                    self.sheet.batch_update(updates)
+                profiler.count('sheets.write', updates)
+
+    def shopping_sheet(self):
+        """買うものリスト用のワークシート(なければ作成)"""
+        if self._shopping_sheet is None:
+            import gspread
+            
+            spreadsheet = self.sheet.spreadsheet
+            try:
+                self._shopping_sheet = spreadsheet.worksheet(self.shopping_title)
+            except gspread.exceptions.WorksheetNotFound:
+                self._shopping_sheet = spreadsheet.add_worksheet(self.shopping_title, rows=100, cols=len(SHOPPING_COLUMNS))
+                self._shopping_sheet.update([SHOPPING_COLUMNS], 'A1')
+        return self._shopping_sheet
+    
+    def fetch_shopping_list(self):
+        rows = self.shopping_sheet().get_all_values()[1:]
+        return [(row[0], row[1]) for row in rows if len(row) >= 2 and row[1]]
+    
+    def add_shopping_item(self, kind, item_name):
+        # 末尾に1行追加するだけ(全体は書き直さない)
+        self.shopping_sheet().append_row([kind, item_name], value_input_option='RAW')
+        get_profiler().count('sheets.write', [[kind, item_name]])
+    
+    def remove_shopping_item(self, kind, item_name):
+        sheet = self.shopping_sheet()
+        for row_number, row in enumerate(sheet.get_all_values()[1:], 2):
+            if row[:2] == [kind, item_name]:
+                sheet.delete_rows(row_number)
+                get_profiler().count('sheets.write')
+                return
+
+class WriteBehindStore:
+    """編集をローカルのコピーに即時反映し、バックグラウンドでシートへ書き込むストア"""
+    
+    name = 'Google Sheets(バックグラウンド書き込み)'
+    max_delay = 60
+    history = 32
+    
+    def __init__(self, target, base_delay=1.0):
+        self.target = target
+        self.base_delay = base_delay
+        self.last_synced = None
+        self.last_error = None
+        self._header = None
+        self._pending_cells = {}  # (行番号, 列番号) → 最新の値(同じセルの編集はまとめる)
+        self._full_values = None  # 全体の書き直しが必要な場合の内容
+        self._oldest = None
+        self._inflight_cells = {}   # 書き込み中のセル(反映されるまで読み込み結果に重ねる)
+        self._inflight_full = None
+        self._inflight_since = None
+        self._completed = 0  # 書き込みが完了した回数
+        self._recent = deque(maxlen=self.history)  # 最近完了した書き込み (完了番号, 全体, セル, ヘッダー)
+        self._closed = False
+        self._stopped = False  # close() 後にキューを反映し終えてスレッドが止まった
+        self._cond = threading.Condition()
+        
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    @property
+    def depth(self):
+        """書き込み待ちの行数"""
+        with self._cond:
+            queued = 1 if self._full_values is not None else len({row for row, _ in self._pending_cells})
+            inflight = 1 if self._inflight_full is not None else len({row for row, _ in self._inflight_cells})
+            return queued + inflight
+    
+    @property
+    def lag(self):
+        """最も古い未反映の編集からの経過秒数"""
+        with self._cond:
+            starts = [t for t in (self._oldest, self._inflight_since) if t is not None]
+        return time.monotonic() - min(starts) if starts else 0.0
+    
+    def fetch_records(self):
+        while True:
+            with self._cond:
+                started = self._completed
+            records = self.target.fetch_records()
+            
+            # シートに未反映の編集を重ねて返す
+            with self._cond:
+                if self._full_values is not None:
+                    return values_to_records(self._full_values)
+                
+                # 読み込み中に完了した書き込みは、読み込み結果に含まれていない可能性がある
+                missed = [push for push in self._recent if push[0] > started]
+                if len(missed) < self._completed - started:
+                    continue  # 履歴より多く完了していたら読み直す
+                layers = [(full, cells, header) for _, full, cells, header in missed]
+                layers.append((self._inflight_full, self._inflight_cells, self._header))
+                layers.append((None, self._pending_cells, self._header))
+                
+                for full_values, cells, header in layers:
+                    if full_values is not None:
+                        records = values_to_records(full_values)
+                    else:
+                        records = self._overlay(records, cells, header)
+                return records
+    
+    @staticmethod
+    def _overlay(records, cells, header):
+        for (row_number, col_number), value in sorted(cells.items()):
+            while row_number - 2 >= len(records):
+                records.append(dict.fromkeys(header, ''))
+            records[row_number - 2] = {**records[row_number - 2], header[col_number - 1]: value}
+        return records
+    
+    def version(self):
+        return self.target.version()
+    
+    # 買うものリストは1件ずつの操作なのでそのままシートに書き込む
+    def fetch_shopping_list(self):
+        return self.target.fetch_shopping_list()
+    
+    def add_shopping_item(self, kind, item_name):
+        self.target.add_shopping_item(kind, item_name)
+    
+    def remove_shopping_item(self, kind, item_name):
+        self.target.remove_shopping_item(kind, item_name)
+    
+    def write(self, old_values, new_values):
+        """変更されたセルをキューに積んですぐに戻る(スレッドが止まった後はその場で書き込む)"""
+        with self._cond:
+            stopped = self._stopped
+            if not stopped:
+                self._enqueue(old_values, new_values)
+                self._cond.notify()
+        
+        if stopped:
+            # close() 後はキューに積んでも反映されないので、その場でシートに書き込む
+            self.target.write(old_values, new_values)
+            self.last_synced = datetime.now()
+            with self._cond:
+                self._completed += 1
+                self._recent.append((self._completed, new_values, {}, new_values[0]))
+    
+    def _enqueue(self, old_values, new_values):
+        if (self._full_values is not None or old_values is None
+                or old_values[0] != new_values[0] or len(new_values) < len(old_values)):
+            self._full_values = new_values
+            self._pending_cells = {}
+        else:
+            for i in range(1, len(new_values)):
+                old_row = old_values[i] if i < len(old_values) else []
+                new_row = new_values[i]
+                if old_row == new_row:
+                    continue
+                for j, value in enumerate(new_row):
+                    if j >= len(old_row) or old_row[j] != value:
+                        self._pending_cells[(i + 1, j + 1)] = value
+        
+        self._header = new_values[0]
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+    
+    def close(self):
+        """キューに残った書き込みを反映し終えたらスレッドを止める"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+    
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                while self._full_values is None and not self._pending_cells:
+                    if self._closed:
+                        self._stopped = True
+                        return
+                    self._cond.wait()
+                full_values, cells, header = self._full_values, self._pending_cells, self._header
+                self._full_values, self._pending_cells = None, {}
+                self._inflight_full, self._inflight_cells = full_values, cells
+                self._inflight_since, self._oldest = self._oldest, None
+            
+            try:
+                self._push(full_values, cells)
+            except Exception as e:
+                failures += 1
+                self.last_error = str(e)
+                self._requeue(full_values, cells)
+                # クォータ超過などは指数バックオフで再試行
+                delay = self.base_delay * 2 ** (failures - 1) if _is_retryable_error(e) else self.max_delay
+                time.sleep(min(delay, self.max_delay))
+                continue
+            
+            failures = 0
+            self.last_error = None
+            self.last_synced = datetime.now()
+            with self._cond:
+                self._completed += 1
+                self._recent.append((self._completed, full_values, cells, header))
+                self._inflight_full, self._inflight_cells = None, {}
+                self._inflight_since = None
+    
+    def _push(self, full_values, cells):
+        from gspread.utils import rowcol_to_a1
+        
+        if full_values is not None:
+            self.target.write(None, full_values)
+            return
+        
+        updates = [
+            {'range': rowcol_to_a1(row_number, col_number), 'values': [[value]]}
+            for (row_number, col_number), value in sorted(cells.items())
+        ]
+        self.target.sheet.batch_update(updates)
+        get_profiler().count('sheets.write', updates)
+    
+    def _requeue(self, full_values, cells):
+        """失敗した書き込みを、その後の編集を優先して戻す"""
+        with self._cond:
+            if full_values is not None and self._full_values is None:
+                full_values = [list(row) for row in full_values]
+                width = len(full_values[0])
+                for (row_number, col_number), value in self._pending_cells.items():
+                    while row_number - 1 >= len(full_values):
+                        full_values.append([''] * width)
+                    full_values[row_number - 1][col_number - 1] = value
+                self._full_values = full_values
+                self._pending_cells = {}
+            elif full_values is None and self._full_values is None:
+                for cell, value in cells.items():
+                    self._pending_cells.setdefault(cell, value)
+            
+            self._oldest = min((t for t in (self._oldest, self._inflight_since) if t is not None), default=None)
+            self._inflight_full, self._inflight_cells = None, {}
+            self._inflight_since = None
+
+class SQLiteStore:
+    """ローカルのSQLiteに在庫を保存するストレージ(WALモード、項目名にインデックス)"""
+    
+    name = 'SQLite'
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        
+        column_defs = ", ".join(
+            f'"{col}" INTEGER NOT NULL DEFAULT 0' if col in INTEGER_COLUMNS else f'"{col}" TEXT NOT NULL DEFAULT \'\''
+            for col in INVENTORY_COLUMNS
+        )
+        conn = self._connect()
+        with conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS inventory (row_id INTEGER PRIMARY KEY, {column_defs})")
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory ("項目名")')
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS shopping_list ("
+                "position INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, name TEXT NOT NULL, UNIQUE (kind, name))"
+            )
+    
+    def _connect(self):
+        # 接続はスレッドごとに持ち、WALで読み取りを並行させる
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def fetch_records(self):
+        columns = ", ".join(f'"{col}"' for col in INVENTORY_COLUMNS)
+        with get_profiler().span('sqlite.fetch'):
+            rows = self._connect().execute(f"SELECT {columns} FROM inventory ORDER BY row_id").fetchall()
+        return [dict(zip(INVENTORY_COLUMNS, row)) for row in rows]
+    
+    def version(self):
+        return self._connect().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+    
+    def is_empty(self):
+        return self._connect().execute("SELECT 1 FROM inventory LIMIT 1").fetchone() is None
+    
+    def adjust(self, column, deltas):
+        """項目名ごとの増減をDB上の現在の値に加算(0未満にはしない)し、見つからなかった項目名を返す"""
+        conn = self._connect()
+        missing = []
+        
+        with get_profiler().span('sqlite.adjust'), conn:
+            for item_name, delta in deltas.items():
+                cursor = conn.execute(
+                    f'UPDATE inventory SET "{column}" = MAX(0, "{column}" + ?) '
+                    'WHERE row_id = (SELECT MIN(row_id) FROM inventory WHERE "項目名" = ?)',
+                    (delta, item_name)
+                )
+                if cursor.rowcount == 0:
+                    missing.append(item_name)
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return missing
+    
+    def fetch_shopping_list(self):
+        return self._connect().execute("SELECT kind, name FROM shopping_list ORDER BY position").fetchall()
+    
+    def add_shopping_item(self, kind, item_name):
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO shopping_list (kind, name) VALUES (?, ?)", (kind, item_name))
+    
+    def remove_shopping_item(self, kind, item_name):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM shopping_list WHERE kind = ? AND name = ?", (kind, item_name))
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def write(self, old_values, new_values):
+        """変更された行だけを1トランザクションで更新"""
+        new_rows = self._to_rows(new_values)
+        conn = self._connect()
+        
+        with get_profiler().span('sqlite.write'), conn:
+            if old_values is None or old_values[0] != new_values[0] or len(new_values) < len(old_values):
+                conn.execute("DELETE FROM inventory")
+                self._insert(conn, new_rows, start=1)
+            else:
+                old_rows = self._to_rows(old_values)
+                for row_id, (old_row, new_row) in enumerate(zip(old_rows, new_rows), 1):
+                    changed = [col for col, old, new in zip(INVENTORY_COLUMNS, old_row, new_row) if old != new]
+                    if changed:
+                        assignments = ", ".join(f'"{col}" = ?' for col in changed)
+                        params = [new_row[INVENTORY_COLUMNS.index(col)] for col in changed]
+                        conn.execute(f"UPDATE inventory SET {assignments} WHERE row_id = ?", params + [row_id])
+                self._insert(conn, new_rows[len(old_rows):], start=len(old_rows) + 1)
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+    
+    def _insert(self, conn, rows, start):
+        if not rows:
+            return
+        columns = ", ".join(f'"{col}"' for col in INVENTORY_COLUMNS)
+        placeholders = ", ".join("?" * (len(INVENTORY_COLUMNS) + 1))
+        conn.executemany(
+            f"INSERT INTO inventory (row_id, {columns}) VALUES ({placeholders})",
+            [[row_id] + row for row_id, row in enumerate(rows, start)]
+        )
+    
+    @staticmethod
+    def _to_rows(values):
+        # シートの列順に関係なく、保存対象の列だけを取り出す
+        header = values[0]
+        positions = [header.index(col) if col in header else None for col in INVENTORY_COLUMNS]
+        return [[row[pos] if pos is not None and pos < len(row) else '' for pos in positions] for row in values[1:]]
+
+class SheetSync:
+    """ローカルストアの内容を一定間隔でGoogle Sheetsへ反映"""
+    
+    def __init__(self, store, connect, interval):
+        self.store = store
+        self.target = None
+        self.interval = interval
+        self.last_synced = None
+        self.last_error = None
+        self._synced_version = None
+        self._pushed_values = None
+        self._connect = connect
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def sync(self):
+        with self._lock:
+            version = self.store.version()
+            if version == self._synced_version:
+                return
+            
+            if self.target is None:
+                # シートへの接続は最初の同期のとき(バックグラウンド)に行う
+                sheet = self._connect()
+                if sheet is None:
+                    raise RuntimeError("Google Sheetsに接続できませんでした")
+                self.target = GoogleSheetStore(sheet)
+            if self._pushed_values is None:
+                # 初回はシートの現在の内容を基準に差分を取る(列の並びとSQLiteにない列はシートに合わせる)
+                sheet_records = self.target.fetch_records()
+                columns = list(sheet_records[0]) if sheet_records else INVENTORY_COLUMNS
+                self._pushed_values = records_to_values(sheet_records, columns)
+            
+            values = project_to_sheet(self.store.fetch_records(), self._pushed_values)
+            self.target.write(self._pushed_values, values)
+            self._pushed_values = values
+            self._synced_version = version
+            self.last_synced = datetime.now()
+    
+    def close(self):
+        """最後に1回同期してからスレッドを止める"""
+        self._stop.set()
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.sync()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+
+def create_store(config):
+    """storage.backend で指定されたストレージを作成"""
+    sheet_url = config["sheet_url"]
+    credentials = config.get("credentials", "gsheets")
+    
+    if config.get("backend", "sheets") == "sqlite":
+        store = SQLiteStore(config.get("sqlite_path", "inventory.db"))
+        if store.is_empty():
+            # 初回はGoogle Sheetsの内容を取り込む
+            sheet = open_worksheet(sheet_url, credentials, config.get("worksheet"))
+            if sheet is not None:
+                records = sheet.get_all_records()
+                store.write(None, records_to_values(records, list(records[0]) if records else INVENTORY_COLUMNS))
+        return store
+    
+    sheet = open_worksheet(sheet_url, credentials, config.get("worksheet"))
+    if sheet is None:
+        return None
+    store = GoogleSheetStore(sheet)
+    return WriteBehindStore(store) if config.get("write_behind", True) else store
+
+def create_sheet_sync(store, config):
+    """SQLite利用時、Google Sheetsへの定期同期を開始(sync_interval=0で無効)"""
+    interval = config.get("sync_interval", 300)
+    if config.get("backend", "sheets") != "sqlite" or not interval:
+        return None
+    connect = lambda: open_worksheet(
+        config["sheet_url"], config.get("credentials", "gsheets"), config.get("worksheet")
+    )
+    return SheetSync(store, connect, interval)
+
+class SnapshotCache:
+    """ストアのレコードをTTL付きでキャッシュし、ヒット/ミス数を記録
+    
+    全セッションで共有し、内容が変わるたびに revision を進めて変更された行を記録する。
+    names_revision は項目名・カテゴリ・行の並びが変わったときだけ進める(在庫数の増減では変わらない)。
+    """
+    
+    history = 64
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.records = None
+        self.version = None
+        self.revision = time.time_ns()  # 作り直したキャッシュとも番号が重ならないように時刻から始める
+        self.names_revision = self.revision
+        self.fetched_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._changes = deque(maxlen=self.history)  # (revision, 変更された行番号の集合 or None)
+        self._lock = threading.Lock()
+    
+    def get_records(self, store):
+        """(レコード, revision, names_revision) を同じ時点の組で返す"""
+        with self._lock:
+            now = time.monotonic()
+            version = None
+            
+            if self.records is not None:
+                if now - self.fetched_at < self.ttl:
+                    self.hits += 1
+                    return self.records, self.revision, self.names_revision
+                
+                # TTL切れでもストアが更新されていなければ全件取得を省略
+                version = store.version()
+                if version is not None and version == self.version:
+                    self.fetched_at = now
+                    self.hits += 1
+                    return self.records, self.revision, self.names_revision
+            else:
+                version = store.version()
+            
+            self._set_records(store.fetch_records())
+            self.version = version
+            self.fetched_at = now
+            self.misses += 1
+            return self.records, self.revision, self.names_revision
+    
+    def replace(self, records):
+        """書き込んだ内容をそのままキャッシュに反映(次のTTL切れで再確認)"""
+        with self._lock:
+            self._set_records(records)
+            self.version = None
+            self.fetched_at = time.monotonic()
+    
+    def invalidate(self):
+        # 差分を取れるように内容は残し、次回は必ず取得し直す
+        with self._lock:
+            self.version = None
+            self.fetched_at = float('-inf')
+    
+    def changes_since(self, revision):
+        """revision 以降に変更された行番号の集合(追いきれない場合は None)"""
+        with self._lock:
+            if revision == self.revision:
+                return set()
+            if not self._changes or revision is None or revision < self._changes[0][0] - 1:
+                return None
+            changed = set()
+            for rev, rows in self._changes:
+                if rev <= revision:
+                    continue
+                if rows is None:
+                    return None
+                changed |= rows
+            return changed
+    
+    def _set_records(self, records):
+        old = self.records
+        if old is not None and len(old) == len(records):
+            rows = {i for i, (a, b) in enumerate(zip(old, records)) if a != b}
+            if not rows:
+                return
+        else:
+            rows = None  # 行の追加・削除は全体を読み直す
+        
+        self.records = records
+        self.revision += 1
+        self._changes.append((self.revision, rows))
+        if rows is None or any(
+            old[i].get(col) != records[i].get(col) for i in rows for col in ('項目名', 'カテゴリ')
+        ):
+            self.names_revision = self.revision
+
+class ShoppingList:
+    """買うものリスト(種類ごとの順序付き集合)。ストアに1件ずつ保存し、全セッションで共有する"""
+    
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+        self.revision = 0
+        self._items = None  # (種類, 項目名) → None の順序付き辞書
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+    
+    def _refresh(self):
+        # 別のプロセスやシートの直接編集はTTLごとに取り込む
+        now = time.monotonic()
+        if self._items is not None and now - self._loaded_at < self.ttl:
+            return
+        items = OrderedDict.fromkeys(tuple(item) for item in self.store.fetch_shopping_list())
+        if self._items is None or list(items) != list(self._items):
+            self._items = items
+            self.revision += 1
+        self._loaded_at = now
+    
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+        return self.revision
+    
+    def items(self, kind):
+        with self._lock:
+            self._refresh()
+            return [item_name for item_kind, item_name in self._items if item_kind == kind]
+    
+    def add(self, kind, item_name):
+        """追加した場合はTrue(すでにあればFalse)"""
+        with self._lock:
+            self._refresh()
+            if (kind, item_name) in self._items:
+                return False
+            self.store.add_shopping_item(kind, item_name)
+            self._items[(kind, item_name)] = None
+            self.revision += 1
+            return True
+    
+    def remove(self, kind, item_name):
+        with self._lock:
+            self._refresh()
+            if (kind, item_name) not in self._items:
+                return False
+            self.store.remove_shopping_item(kind, item_name)
+            del self._items[(kind, item_name)]
+            self.revision += 1
+            return True
+
+class Tenant:
+    """1世帯分のストア・同期・スナップショットキャッシュ・買うものリスト"""
+    
+    def __init__(self, tenant_id, config):
+        self.id = tenant_id
+        self.config = config
+        self.name = config.get("name", tenant_id)
+        self.store = create_store(config)
+        self.sync = create_sheet_sync(self.store, config) if self.store is not None else None
+        self.cache = SnapshotCache(get_config("cache").get("ttl_seconds", 30))
+        self.shopping = ShoppingList(self.store, self.cache.ttl)
+        self.aliases = ReceiptAliases(config.get("alias_path", "receipt_aliases.json"))
+        self.receipts = AppliedReceipts(config.get("receipts_path", "applied_receipts.json"))
+        self.lock = threading.Lock()  # 在庫の増減はこの世帯の中で1つずつ反映する
+        self.last_used = time.monotonic()
+    
+    @property
+    def busy(self):
+        """シートへの書き込み待ちが残っている間は破棄しない"""
+        return isinstance(self.store, WriteBehindStore) and self.store.depth > 0
+    
+    def close(self):
+        if self.sync is not None:
+            self.sync.close()
+        if self.store is not None and hasattr(self.store, 'close'):
+            self.store.close()
+        self.cache.invalidate()
+
+# 世帯ごとに必ず指定するキー(storage や既定のシートに流れると別の世帯のデータを読み書きしてしまう)
+TENANT_REQUIRED_KEYS = ("sheet_url", "worksheet")
+
+def get_tenant_configs():
+    """secretsの tenants.<id> を世帯ごとの設定に展開(未設定なら storage を使う1世帯)
+    
+    必須のキーが欠けた世帯には missing_keys を付け、接続せずにエラーにする。
+    """
+    storage = dict(get_config("storage"))
+    tenants = get_config("tenants")
+    if not tenants:
+        return {"default": {"sheet_url": DEFAULT_SHEET_URL, **storage}}
+    
+    shared = {key: value for key, value in storage.items() if key not in TENANT_REQUIRED_KEYS}
+    configs = {}
+    for tenant_id, config in tenants.items():
+        config = dict(config)
+        # SQLiteのファイルとレシートの別名表は世帯ごとに分ける
+        configs[tenant_id] = {
+            **shared,
+            "sqlite_path": f"inventory_{tenant_id}.db",
+            "alias_path": f"receipt_aliases_{tenant_id}.json",
+            "receipts_path": f"applied_receipts_{tenant_id}.json",
+            **config,
+            "missing_keys": [key for key in TENANT_REQUIRED_KEYS if not config.get(key)]
+        }
+    return configs
+
+class TenantRegistry:
+    """世帯IDごとのTenantを上限付きで保持し、使われていないものから破棄する"""
+    
+    def __init__(self, configs, max_tenants=8, idle_seconds=1800):
+        self.configs = configs
+        self.max_tenants = max_tenants
+        self.idle_seconds = idle_seconds
+        self._tenants = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._tenants)
+    
+    def get(self, tenant_id):
+        if tenant_id not in self.configs or self.configs[tenant_id].get("missing_keys"):
+            return None
+        
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is not None:
+                self._tenants.move_to_end(tenant_id)
+                tenant.last_used = time.monotonic()
+                # 世帯数が上限以下でもアイドル時間切れのものはここで外す
+                evicted = self._evict(keep=tenant_id)
+        if tenant is not None:
+            for old in evicted:
+                old.close()
+            return tenant
+        
+        # 接続に時間がかかるのでロックの外で作成する
+        tenant = Tenant(tenant_id, self.configs[tenant_id])
+        if tenant.store is None:
+            return None
+        
+        with self._lock:
+            current = self._tenants.get(tenant_id)
+            if current is not None:
+                # 別のセッションが先に作成していた場合はそちらを使う
+                tenant.close()
+                tenant = current
+            self._tenants[tenant_id] = tenant
+            self._tenants.move_to_end(tenant_id)
+            tenant.last_used = time.monotonic()
+            evicted = self._evict(keep=tenant_id)
+        
+        for old in evicted:
+            old.close()
+        return tenant
+    
+    def _evict(self, keep):
+        now = time.monotonic()
+        evicted = []
+        # 古い順に、アイドル時間切れか上限超過のものを外す
+        for tenant_id, tenant in list(self._tenants.items()):
+            if tenant_id == keep or tenant.busy:
+                continue
+            if now - tenant.last_used > self.idle_seconds or len(self._tenants) > self.max_tenants:
+                evicted.append(self._tenants.pop(tenant_id))
+        return evicted
+
+@st.cache_resource
+def get_tenant_registry():
+    config = get_config("tenancy")
+    return TenantRegistry(
+        get_tenant_configs(),
+        max_tenants=config.get("max_tenants", 8),
+        idle_seconds=config.get("idle_seconds", 1800)
+    )
+
+def resolve_tenant_id(registry):
+    """URLの ?household=<id>&key=<access_key> から世帯IDを決める
+    
+    複数の世帯を設定している場合は household の指定を必須にする(先頭の世帯を見せない)。
+    """
+    tenant_id = st.query_params.get("household")
+    if tenant_id is None:
+        if len(registry.configs) > 1:
+            return None
+        tenant_id = next(iter(registry.configs))
+    config = registry.configs.get(tenant_id)
+    if config is None:
+        return None
+    
+    access_key = config.get("access_key")
+    if access_key and not hmac.compare_digest(str(access_key), st.query_params.get("key", "")):
+        return None
+    return tenant_id
+
+# 賞味期限として読める書式(シートの表示形式によって区切りが変わる)
+EXPIRY_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d', '%Y年%m月%d日', '%Y-%m-%d %H:%M:%S']
+
+def parse_expiry(values):
+    """賞味期限の値を日付に変換(読めない値はNaT)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    text = values.astype(str).str.strip()
+    parsed = pd.to_datetime(text, format=EXPIRY_FORMATS[0], errors='coerce')
+    for date_format in EXPIRY_FORMATS[1:]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed = parsed.fillna(pd.to_datetime(text[missing], format=date_format, errors='coerce'))
+    return parsed
+
+def build_inventory_frame(records):
+    """レコードから型付きの在庫DataFrameを作成"""
+    df = pd.DataFrame(records)
+    
+    # 必要な列を確保
+    for col in INVENTORY_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    
+    # 数値は32bit整数、カテゴリはcategory型、賞味期限はdatetime64で保持
+    for col in INTEGER_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('Int32')
+    df['カテゴリ'] = df['カテゴリ'].astype(str).astype('category')
+    # 書き戻すときにシートの表記を保てるよう、YYYY-MM-DD と違う表記の元の値だけをカテゴリ型で残す
+    raw = df['賞味期限']
+    df['賞味期限'] = parse_expiry(raw)
+    canonical = df['賞味期限'].dt.strftime('%Y-%m-%d').fillna('')
+    df['_賞味期限_元'] = raw.where(raw.astype(str) != canonical).astype('category')
+    
+    # 賞味期限と在庫状態は読み込み時に1回だけ計算
+    df = classify_expiry(df)
+    df = classify_stock(df)
+    return df
+
+def load_data(tenant):
+    try:
+        # 別のセッションの書き込みで後から進んだ版を記録しないよう、レコードと版は同時に取る
+        records, revision, names_revision = tenant.cache.get_records(tenant.store)
+        df = st.session_state.get('inventory_frame')
+        
+        # 日付が変わったら賞味期限の判定をやり直すため全体を作り直す
+        changed = None
+        if df is not None and st.session_state.get('inventory_date') == datetime.now().date():
+            changed = tenant.cache.changes_since(st.session_state.get('inventory_revision'))
+        
+        if changed is None:
+            df = build_inventory_frame(records)
+            # 差分書き込みの基準となるスナップショットを保持
+            st.session_state.sheet_snapshot = to_sheet_values(df)
+        elif changed:
+            # 他のセッションが変更した行だけを作り直す
+            df = merge_inventory_rows(df, build_inventory_frame([records[i] for i in sorted(changed)]), sorted(changed))
+            snapshot = st.session_state.sheet_snapshot
+            for i, row in zip(sorted(changed), to_sheet_values(df.loc[sorted(changed)])[1:]):
+                snapshot[i + 1] = row
+        
+        st.session_state.inventory_frame = df
+        st.session_state.inventory_revision = revision
+        st.session_state.names_revision = names_revision
+        st.session_state.inventory_date = datetime.now().date()
+        
+        # 画面側で書き換えても共有の元データに影響しないようにコピーを返す
+        return df.copy()
+    except Exception as e:
+        st.error(f"データ読み込みエラー: {e}")
+        return None
+
+def merge_inventory_rows(df, rows, index):
+    """作り直した行を在庫DataFrameの該当位置に反映"""
+    rows.index = index
+    df = df.copy()
+    for col in rows.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # 新しいカテゴリが含まれていれば追加してから代入する
+            new = rows[col].astype(object).dropna().unique()
+            missing = [v for v in new if v not in df[col].cat.categories]
+            if missing:
+                df[col] = df[col].cat.add_categories(missing)
+            df.loc[index, col] = rows[col].astype(object).values
+        else:
+            df.loc[index, col] = rows[col].values
+    return df
+
+def render_live_refresh(tenant, interval):
+    """他のセッションの変更を一定間隔で確認し、あれば再描画する"""
+    
+    @st.fragment(run_every=interval)
+    def poll():
+        # TTL内ならキャッシュを見るだけなので軽い
+        _, revision, _ = tenant.cache.get_records(tenant.store)
+        if (revision != st.session_state.get('inventory_revision')
+                or tenant.shopping.refresh() != st.session_state.get('shopping_revision')):
+            st.rerun()
+    
+    poll()
+
+MATCH_LABELS = {'exact': '✓ 完全一致', 'alias': '✓ 登録済みの表記', 'fuzzy': '≈ 類似', 'none': '? 未照合(項目名を選択)'}
+
+def render_receipt_preview(tenant, df, detected_items, receipt_hash):
+    """検出結果を編集できる表で確認し、チェックした商品をまとめて在庫に追加する"""
+    applied = tenant.receipts.get(receipt_hash)
+    complete = applied is not None and applied['complete']
+    preview = pd.DataFrame({
+        '追加': [item['match'] in ('exact', 'alias') or item['score'] >= 0.8 for item in detected_items],
+        '項目名': [item['name'] for item in detected_items],
+        '数量': [item['quantity'] for item in detected_items],
+        '金額': [item['price'] for item in detected_items],
+        '照合': [
+            MATCH_LABELS[item['match']] + (f"({item['score']:.0%})" if item['match'] == 'fuzzy' else '')
+            for item in detected_items
+        ],
+        'レシートの表記': [item['source'] for item in detected_items],
+    })
+    
+    edited = st.data_editor(
+        preview,
+        key=f"receipt_preview_{receipt_hash[:16]}",
+        hide_index=True,
+        use_container_width=True,
+        disabled=complete,
+        column_config={
+            '項目名': st.column_config.SelectboxColumn('項目名', options=sorted(df['項目名'].astype(str).unique())),
+            '数量': st.column_config.NumberColumn('数量', min_value=0, max_value=99, step=1, required=True),
+            '金額': st.column_config.NumberColumn('金額', format="¥%d", disabled=True),
+            '照合': st.column_config.TextColumn('照合', disabled=True),
+            'レシートの表記': st.column_config.TextColumn('レシートの表記', disabled=True),
+        }
+    )
+    
+    if complete:
+        st.success(f"✓ このレシートは在庫に反映済みです({applied['applied_at']})")
+        return
+    if applied is not None:
+        st.info(f"反映済みの項目: {', '.join(applied['items'])}(残りの項目だけを追加します)")
+    
+    if st.button("✓ まとめて在庫に追加", key=f"apply_receipt_{receipt_hash[:16]}", use_container_width=True):
+        deltas = Counter()
+        for selected, item_name, quantity in zip(edited['追加'], edited['項目名'], edited['数量']):
+            if selected and isinstance(item_name, str) and item_name and quantity > 0:
+                deltas[item_name] += int(quantity)
+        if not deltas:
+            st.warning("追加する商品が選ばれていません")
+            return
+        
+        applied, missing = apply_receipt(tenant, receipt_hash, dict(deltas))
+        report_missing_items(missing)
+        # 反映できた対応を覚えて次回から同じ表記を照合する
+        for item, selected, item_name in zip(detected_items, edited['追加'], edited['項目名']):
+            if (selected and item_name in applied
+                    and (item['match'] != 'exact' or item_name != item['name'])):
+                tenant.aliases.learn(item['source'], item_name)
+        if applied and missing == []:
+            st.success(f"✓ {len(applied)}件の商品を在庫に追加しました!")
+            st.rerun()
+
+def _normalize_cell(value):
+    """シートに書き込めるセル値に変換(欠損→空文字、日付→YYYY-MM-DD、numpy型→Python型)"""
+    if value is None or pd.isna(value):
+        return ''
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d')
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+def to_sheet_values(df):
+    """DataFrameをヘッダー付きの2次元リストに変換(_で始まる計算列は除外)"""
+    columns = [col for col in df.columns if not str(col).startswith('_')]
+    rows = [[_normalize_cell(v) for v in row] for row in df[columns].values.tolist()]
+    
+    # 賞味期限は日付が変わっていなければ読み込んだときの表記のまま書き戻す
+    if '_賞味期限_元' in df.columns and '賞味期限' in columns:
+        raw = df['_賞味期限_元']
+        raw_dates, current = parse_expiry(raw), parse_expiry(df['賞味期限'])
+        unchanged = raw.notna() & ((raw_dates == current) | (raw_dates.isna() & current.isna()))
+        position = columns.index('賞味期限')
+        for row, keep, text in zip(rows, unchanged.tolist(), raw.tolist()):
+            if keep:
+                row[position] = text
+    return [columns] + rows
+
+def diff_sheet_values(old_values, new_values):
+    """スナップショットとの差分から batch_update 用の更新リストを作成"""
+    from gspread.utils import rowcol_to_a1
+    
+    updates = []
+    
+    # 既存行は変更されたセルだけを書き込む
+    for i in range(1, len(old_values)):
+        old_row, new_row = old_values[i], new_values[i]
+        for j, value in enumerate(new_row):
+            if j >= len(old_row) or old_row[j] != value:
+                updates.append({
+                    'range': rowcol_to_a1(i + 1, j + 1),
+                    'values': [[value]]
+                })
+    
+    # 追加行はまとめて1つの範囲で書き込む
+    if len(new_values) > len(old_values):
+        updates.append({
+            'range': rowcol_to_a1(len(old_values) + 1, 1),
+            'values': new_values[len(old_values):]
+        })
+    
+    return updates
+
+def update_data(tenant, df):
+    try:
+        data = to_sheet_values(df)
+        tenant.store.write(st.session_state.get('sheet_snapshot'), data)
+        st.session_state.sheet_snapshot = data
+        # 変換後の値ではなくストアの内容を共有キャッシュに取り込み直す
+        tenant.cache.invalidate()
+        return True
+    except Exception as e:
+        st.error(f"更新エラー: {e}")
+        return False
+
+def adjust_stock(tenant, deltas, column='予備数'):
+    """項目名ごとの増減を最新の在庫に反映し、見つからなかった項目名を返す(失敗時はNone)
+    
+    画面の値で上書きせず増減として反映するので、別の端末で同時に押された➕/➖も失われない。
+    """
+    try:
+        with tenant.lock:
+            if hasattr(tenant.store, 'adjust'):
+                # ストア側で加算できる場合(SQLite)は1トランザクションで反映
+                missing = tenant.store.adjust(column, deltas)
+                tenant.cache.invalidate()
+                return missing
+            
+            # 共有キャッシュの内容に増減を適用し、変わったセルだけを書き込む。
+            # TTL内でもシートが直接(または別のプロセスから)編集されていれば読み直し、最新の値に増減を適用する
+            records, _, _ = tenant.cache.get_records(tenant.store)
+            version = tenant.store.version()
+            if version is None or version != tenant.cache.version:
+                tenant.cache.invalidate()
+                records, _, _ = tenant.cache.get_records(tenant.store)
+            name_to_index = {}
+            for index, record in enumerate(records):
+                name_to_index.setdefault(record.get('項目名'), index)
+            
+            updated = list(records)
+            missing = []
+            for item_name, delta in deltas.items():
+                index = name_to_index.get(item_name)
+                if index is None:
+                    missing.append(item_name)
+                    continue
+                current = pd.to_numeric(updated[index].get(column), errors='coerce')
+                current = 0 if pd.isna(current) else int(current)
+                updated[index] = {**updated[index], column: max(0, current + delta)}
+            
+            columns = list(records[0]) if records else INVENTORY_COLUMNS
+            tenant.store.write(records_to_values(records, columns), records_to_values(updated, columns))
+            tenant.cache.replace(updated)
+            return missing
+    except Exception as e:
+        st.error(f"更新エラー: {e}")
+        return None
+
+def apply_receipt(tenant, receipt_hash, deltas):
+    """レシート1枚分の増減を1回の書き込みで反映(反映済みの項目は数えない)
+    
+    戻り値は (今回反映した項目名のリスト, 見つからなかった項目名のリスト(失敗時はNone))。
+    二重送信や別の端末からの同じレシートでも二重に数えない(反映した項目名は空になる)。
+    すべての項目を反映できたときだけレシートを反映済みにし、それまでは反映した項目を記録する。
+    """
+    with tenant.receipts.lock:
+        entry = tenant.receipts.get(receipt_hash)
+        if entry is not None and entry['complete']:
+            st.info(f"このレシートは反映済みです({entry['applied_at']})")
+            return [], []
+        
+        done = set(entry['items']) if entry is not None else set()
+        skipped = [item_name for item_name in deltas if item_name in done]
+        if skipped:
+            st.info(f"反映済みの項目は除きました: {', '.join(skipped)}")
+        remaining = {item_name: delta for item_name, delta in deltas.items() if item_name not in done}
+        
+        missing = adjust_stock(tenant, remaining) if remaining else []
+        if missing is None:
+            return [], None
+        applied = [item_name for item_name in remaining if item_name not in missing]
+        tenant.receipts.add(receipt_hash, applied, complete=not missing)
+        return applied, missing
+
+def update_shopping_list(tenant, action, kind, item_name):
+    """買うものリストに1件追加/削除(action は 'add' か 'remove')。変更した場合はTrue"""
+    try:
+        if action == 'add':
+            return tenant.shopping.add(kind, item_name)
+        return tenant.shopping.remove(kind, item_name)
+    except Exception as e:
+        st.error(f"更新エラー: {e}")
+        return False
+
+def report_missing_items(missing):
+    """反映できなかった項目(別の端末で削除・改名された)を知らせる"""
+    if missing:
+        st.warning(f"⚠️ 見つからなかったため反映できませんでした: {', '.join(missing)}")
+
+# Vision API関数
+class GoogleVisionBackend:
+    """Google Cloud Vision APIを使うOCRバックエンド"""
+    
+    # batch_annotate_images 1リクエストあたりの画像数の上限
+    batch_size = 16
+    max_workers = 4
+    
+    def __init__(self, api_key):
+        # Vision SDKは重いので、実際にOCRするときに初めて読み込む
+        from google.cloud import vision
+        
+        self.vision = vision
+        self.client = vision.ImageAnnotatorClient(client_options={"api_key": api_key})
+    
+    def detect_texts(self, images):
+        """画像ごとに {'text', 'error'} を返す"""
+        batches = [images[i:i + self.batch_size] for i in range(0, len(images), self.batch_size)]
+        if len(batches) == 1:
+            return self._annotate(batches[0])
+        
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = executor.map(self._annotate, batches)
+        return [result for batch in results for result in batch]
+    
+    def _annotate(self, images):
+        vision = self.vision
+        feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        requests = [
+            vision.AnnotateImageRequest(image=vision.Image(content=image_bytes), features=[feature])
+            for image_bytes in images
+        ]
+        response = self.client.batch_annotate_images(requests=requests)
+        get_profiler().count('vision.annotate', sum(len(image_bytes) for image_bytes in images))
+        
+        results = []
+        for image_response in response.responses:
+            if image_response.error.message:
+                results.append({'text': '', 'error': image_response.error.message})
+            elif image_response.text_annotations:
+                results.append({'text': self._receipt_text(image_response.text_annotations), 'error': None})
+            else:
+                results.append({'text': '', 'error': None})
+        return results
+    
+    @staticmethod
+    def _receipt_text(annotations):
+        """単語ごとの位置から行を組み立てる(取れなければ全体のテキストを使う)"""
+        words = []
+        for annotation in annotations[1:]:
+            vertices = annotation.bounding_poly.vertices
+            if not vertices:
+                continue
+            xs, ys = [v.x for v in vertices], [v.y for v in vertices]
+            words.append((annotation.description, (min(xs), min(ys), max(xs), max(ys))))
+        if not words:
+            return annotations[0].description
+        return '\n'.join(words_to_lines(words))
+
+def words_to_lines(words):
+    """OCRの単語 (テキスト, (x0, y0, x1, y1)) を縦位置で行にまとめ、左から順に連結
+    
+    レシートは商品名と金額が離れているため、全体のテキストでは別の行に分かれることがある。
+    """
+    lines = []
+    for text, box in sorted(words, key=lambda word: (word[1][1] + word[1][3]) / 2):
+        center, height = (box[1] + box[3]) / 2, max(1, box[3] - box[1])
+        line = lines[-1] if lines else None
+        # 行の中心からの距離が文字の高さの半分以内なら同じ行
+        if line is not None and abs(center - line['center']) <= max(height, line['height']) / 2:
+            line['words'].append((text, box))
+            count = len(line['words'])
+            line['center'] += (center - line['center']) / count
+            line['height'] += (height - line['height']) / count
+        else:
+            lines.append({'center': center, 'height': height, 'words': [(text, box)]})
+    
+    result = []
+    for line in lines:
+        parts = []
+        previous = None
+        for text, box in sorted(line['words'], key=lambda word: word[1][0]):
+            # 文字の高さより離れていれば空白を入れる(日本語は1文字ずつ分かれるため詰める)
+            if previous is not None and box[0] - previous[2] > line['height'] * 0.5:
+                parts.append(' ')
+            parts.append(text)
+            previous = box
+        result.append(''.join(parts))
+    return result
+
+class FakeOcrBackend:
+    """テスト・ベンチマーク用のローカルOCRバックエンド(画像のバイト列をそのままテキストとして扱う)"""
+    
+    def detect_texts(self, images):
+        return [{'text': image_bytes.decode('utf-8', errors='ignore'), 'error': None} for image_bytes in images]
+
+OCR_BACKENDS = {
+    'google': lambda: GoogleVisionBackend(st.secrets["google_vision"]["api_key"]),
+    'fake': FakeOcrBackend,
+}
+
+@st.cache_resource
+def get_ocr_backend():
+    """secretsの ocr.backend で指定されたOCRバックエンドを生成して使い回す"""
+    backend = get_config("ocr").get("backend", "google")
+    return OCR_BACKENDS[backend]()
+
+class OcrCache:
+    """画像ハッシュをキーにOCR結果を保持するLRUキャッシュ(cache_dir指定時はディスクにも保存)
+    
+    ディスクのファイルも max_files 件を超えたら、最後に使った日時(更新日時)が古いものから消す。
+    """
+    
+    def __init__(self, max_entries=128, cache_dir=None, max_files=1000):
+        self.max_entries = max_entries
+        self.max_files = max_files
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries = OrderedDict()
+        self._files = OrderedDict()  # ディスク上のキー(古い順)
+        self._lock = threading.Lock()
+        
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            paths = sorted(self.cache_dir.glob('*.txt'), key=lambda path: path.stat().st_mtime)
+            self._files.update((path.stem, None) for path in paths)
+            with self._lock:
+                self._evict_files()
+    
+    @staticmethod
+    def key(image_bytes):
+        return hashlib.sha256(image_bytes).hexdigest()
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.txt"
+            try:
+                text = path.read_text(encoding='utf-8')
+                path.touch()  # 使ったファイルは後回しに消す
+            except FileNotFoundError:
+                return None
+            with self._lock:
+                self._files[key] = None
+                self._files.move_to_end(key)
+            self._remember(key, text)
+            return text
+        return None
+    
+    def put(self, key, text):
+        self._remember(key, text)
+        if self.cache_dir is not None:
+            (self.cache_dir / f"{key}.txt").write_text(text, encoding='utf-8')
+            with self._lock:
+                self._files[key] = None
+                self._files.move_to_end(key)
+                self._evict_files()
+    
+    def _evict_files(self):
+        while len(self._files) > self.max_files:
+            key, _ = self._files.popitem(last=False)
+            (self.cache_dir / f"{key}.txt").unlink(missing_ok=True)
+    
+    def _remember(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_ocr_cache():
+    config = get_config("ocr")
+    return OcrCache(config.get("cache_size", 128), config.get("cache_dir"), config.get("cache_files", 1000))
+
+def _otsu_threshold(pixels):
+    """グレースケール画素の大津の二値化しきい値(単色の画像など、分けられなければNone)"""
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total = weight[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mean[-1] * weight - mean * total) ** 2 / (weight * (total - weight))
+    if np.isnan(between).all():
+        return None
+    return int(np.nanargmax(between))
+
+def find_receipt_region(image, probe_size=256, margin=0.02):
+    """背景より明るいレシート用紙の範囲(left, top, right, bottom)を推定(見つからなければNone)"""
+    from PIL import ImageFilter
+    
+    probe = image.copy()
+    probe.thumbnail((probe_size, probe_size))
+    threshold = _otsu_threshold(np.asarray(probe))
+    if threshold is None:
+        return None
+    mask = probe.point(lambda p: 255 if p > threshold else 0)
+    # 小さな明るい点(反射など)を除いてから範囲を取る
+    bbox = mask.filter(ImageFilter.MinFilter(5)).getbbox()
+    if bbox is None:
+        return None
+    
+    scale_x, scale_y = image.width / probe.width, image.height / probe.height
+    pad_x, pad_y = image.width * margin, image.height * margin
+    left = max(0, int(bbox[0] * scale_x - pad_x))
+    top = max(0, int(bbox[1] * scale_y - pad_y))
+    right = min(image.width, int(bbox[2] * scale_x + pad_x))
+    bottom = min(image.height, int(bbox[3] * scale_y + pad_y))
+    
+    # ほぼ全体、または小さすぎる範囲は誤検出とみなして切り抜かない
+    area = (right - left) * (bottom - top) / (image.width * image.height)
+    if not 0.1 <= area <= 0.9:
+        return None
+    return left, top, right, bottom
+
+def preprocess_receipt_image(image_bytes, max_side=2000, quality=80):
+    """OCRに送る前にレシート画像を回転・切り抜き・縮小・グレースケール化して再圧縮
+    
+    画像として読めない場合や小さくならない場合は元のバイト列を返す。
+    戻り値は (送信するバイト列, {'original_bytes', 'bytes', 'ms'})。
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    
+    start = time.perf_counter()
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # JPEGは縮小しながらデコードする(切り抜き分の余裕を見て2倍の解像度を残す)
+        image.draft('L', (max_side * 2, max_side * 2))
+        image = ImageOps.exif_transpose(image).convert('L')
+    except (UnidentifiedImageError, OSError):
+        return image_bytes, None
+    
+    region = find_receipt_region(image)
+    if region is not None:
+        image = image.crop(region)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=quality, optimize=True)
+    processed = output.getvalue()
+    if len(processed) >= len(image_bytes):
+        processed = image_bytes
+    
+    stats = {
+        'original_bytes': len(image_bytes),
+        'bytes': len(processed),
+        'ms': (time.perf_counter() - start) * 1000
+    }
+    get_profiler().count('ocr.preprocess', stats['original_bytes'] - stats['bytes'])
+    return processed, stats
+
+def preprocess_uploaded_images(uploaded_files):
+    """アップロードされた画像を前処理(同じファイルはセッション内で使い回す)"""
+    config = get_config("ocr")
+    if not config.get("preprocess", True):
+        return [(f.getvalue(), None) for f in uploaded_files]
+    
+    cache = st.session_state.setdefault('preprocessed_images', {})
+    results = []
+    for uploaded_file in uploaded_files:
+        if uploaded_file.file_id not in cache:
+            with get_profiler().span('ocr.preprocess'):
+                cache[uploaded_file.file_id] = preprocess_receipt_image(
+                    uploaded_file.getvalue(), config.get("max_side", 2000), config.get("jpeg_quality", 80)
+                )
+        results.append(cache[uploaded_file.file_id])
+    
+    # 選択から外れたファイルの結果は捨てる
+    current = {f.file_id for f in uploaded_files}
+    for file_id in list(cache):
+        if file_id not in current:
+            del cache[file_id]
+    return results
+
+def format_bytes(size):
+    return f"{size / 1024 / 1024:.1f}MB" if size >= 1024 * 1024 else f"{size / 1024:.0f}KB"
+
+def detect_texts_from_images(images):
+    """複数のレシート画像からテキストをまとめて抽出(同じ画像は再送しない)"""
+    if not images:
+        return []
+    
+    cache = get_ocr_cache()
+    keys = [OcrCache.key(image_bytes) for image_bytes in images]
+    results = [None] * len(images)
+    misses = []
+    
+    for i, key in enumerate(keys):
+        text = cache.get(key)
+        if text is not None:
+            results[i] = {'text': text, 'error': None}
+        else:
+            misses.append(i)
+    
+    if misses:
+        try:
+            with get_profiler().span('ocr.detect_texts'):
+                fetched = get_ocr_backend().detect_texts([images[i] for i in misses])
+        except Exception as e:
+            st.error(f"Vision APIエラー: {e}")
+            fetched = [{'text': '', 'error': str(e)} for _ in misses]
+        
+        for i, result in zip(misses, fetched):
+            # 失敗した結果はキャッシュせず次回に再試行する
+            if result['error'] is None:
+                cache.put(keys[i], result['text'])
+            results[i] = result
+    
+    return results
+
+class ReceiptMatcher:
+    """登録商品名のAho-Corasickオートマトン(1行を1回の走査で照合)"""
+    
+    def __init__(self, names):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]  # 各ノードで一致する最長の商品名
+        
+        for name in names:
+            if not name:
+                continue
+            node = 0
+            for char in name:
+                if char not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.goto[node][char] = len(self.goto) - 1
+                node = self.goto[node][char]
+            self.output[node] = name
+        
+        # 幅優先で失敗リンクを構築
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                # 自ノードで一致しない場合は失敗リンク先の一致を引き継ぐ
+                if self.output[child] is None:
+                    self.output[child] = self.output[self.fail[child]]
+    
+    def longest_match(self, line):
+        """行に含まれる登録商品名のうち最長のものを返す"""
+        best = None
+        node = 0
+        for char in line:
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            name = self.output[node]
+            if name is not None and (best is None or len(name) > len(best)):
+                best = name
+        return best
+
+@st.cache_resource(max_entries=4)
+def get_receipt_matcher(data_key, _names):
+    """項目名が変わるまでオートマトンを再利用(_names はハッシュしない)"""
+    return ReceiptMatcher(_names.astype(str).tolist())
+
+# 小さい仮名→大きい仮名(レシートでは「シヨウユ」のように区別されないことが多い)
+_SMALL_KANA = str.maketrans('ぁぃぅぇぉっゃゅょゎ', 'あいうえおつやゆよわ')
+_FUZZY_IGNORED = re.compile(r'[\sー・\-_.,、。()()「」]+')
+
+def fuzzy_key(text):
+    """あいまい照合用に正規化(検索用の正規化に加え、小さい仮名・長音・記号を無視)"""
+    return _FUZZY_IGNORED.sub('', normalize_text(text).translate(_SMALL_KANA))
+
+class FuzzyMatcher:
+    """項目名の文字2-gram転置インデックスで候補を絞り、候補だけ類似度を計算する"""
+    
+    shortlist = 10
+    min_score = 0.6
+    
+    def __init__(self, names):
+        self.names = list(names)
+        self.keys = [fuzzy_key(name) for name in self.names]
+        self.gram_counts = []
+        self.postings = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            grams = self._grams(key)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings[gram].append(position)
+    
+    @staticmethod
+    def _grams(key):
+        if len(key) < 2:
+            return {key} if key else set()
+        return {key[i:i + 2] for i in range(len(key) - 1)}
+    
+    def match(self, text):
+        """最も似ている項目名と類似度(0〜1)を返す(見つからなければ (None, 0.0))"""
+        from difflib import SequenceMatcher
+        
+        key = fuzzy_key(text)
+        grams = self._grams(key)
+        if not grams:
+            return None, 0.0
+        
+        # 共通する2-gramの割合(Dice係数)で候補を絞る
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        dice = {
+            position: 2 * count / (len(grams) + self.gram_counts[position])
+            for position, count in shared.items()
+        }
+        candidates = [
+            position for position in heapq.nlargest(self.shortlist, dice, key=dice.__getitem__)
+            if dice[position] >= self.min_score / 2
+        ]
+        
+        best, best_score = None, 0.0
+        for position in candidates:
+            score = SequenceMatcher(None, key, self.keys[position], autojunk=False).ratio()
+            if score > best_score:
+                best, best_score = self.names[position], score
+        if best_score < self.min_score:
+            return None, 0.0
+        return best, best_score
+
+@st.cache_resource(max_entries=4)
+def get_fuzzy_matcher(data_key, _names):
+    """項目名が変わるまであいまい照合のインデックスを再利用(_names はハッシュしない)"""
+    return FuzzyMatcher(_names.astype(str).tolist())
+
+def _write_json_atomic(path, data):
+    # 書きかけのファイルを読まないように置き換えで保存
+    temp_path = path.with_suffix('.tmp')
+    temp_path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding='utf-8')
+    temp_path.replace(path)
+
+def _read_json(path, default):
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+class ReceiptAliases:
+    """レシート上の表記 → 項目名 の対応表(確定した照合結果を学習してJSONに保存)"""
+    
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._aliases = _read_json(self.path, {})
+    
+    def __len__(self):
+        return len(self._aliases)
+    
+    def lookup(self, text):
+        return self._aliases.get(fuzzy_key(text))
+    
+    def learn(self, text, item_name):
+        key = fuzzy_key(text)
+        if not key or key == fuzzy_key(item_name):
+            return
+        with self._lock:
+            if self._aliases.get(key) == item_name:
+                return
+            self._aliases[key] = item_name
+            _write_json_atomic(self.path, self._aliases)
+
+class AppliedReceipts:
+    """在庫に反映済みのレシート(画像ハッシュ → 反映日時・反映した項目名・すべて反映できたか)
+    
+    一部の項目が反映できなかったレシートは、反映した項目だけを記録して残りを後から反映できるようにする。
+    古いものから max_entries 件まで保持。
+    """
+    
+    def __init__(self, path, max_entries=1000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()  # 確認から記録までをまとめて行うときに使う
+        self._applied = OrderedDict(_read_json(self.path, {}))
+    
+    def get(self, receipt_hash):
+        """{'applied_at', 'items', 'complete'}(未反映ならNone)"""
+        return self._applied.get(receipt_hash)
+    
+    def add(self, receipt_hash, items, complete):
+        previous = self.get(receipt_hash)
+        applied = list(previous['items']) if previous else []
+        applied += [item for item in items if item not in applied]
+        self._applied[receipt_hash] = {
+            'applied_at': datetime.now().isoformat(timespec='seconds'),
+            'items': applied,
+            'complete': complete
+        }
+        self._applied.move_to_end(receipt_hash)
+        while len(self._applied) > self.max_entries:
+            self._applied.popitem(last=False)
+        _write_json_atomic(self.path, self._applied)
+
+# レシートの行の分類に使うパターン(NFKCで正規化した行に適用)
+_RECEIPT_TOTAL = re.compile(r'小計|合計|総計|預り|預かり|お釣|釣銭|おつり|現金|クレジット|電子マネー|税|対象|点数|買上|支払|ポイント')
+# 英字の目印は単語の一部(COFFEE、HOTEL など)に当たらないよう前後に英字がないときだけ使う
+_RECEIPT_DISCOUNT = re.compile(r'値引|割引|引き|クーポン|(?<![A-Z])OFF(?![A-Z])|^-\s*¥?[\d,]+$', re.IGNORECASE)
+_RECEIPT_HEADER = re.compile(
+    r'\d{2,4}[/年.-]\d{1,2}[/月.-]\d{1,2}|\d{1,2}:\d{2}|(?<![A-Z])TEL(?![A-Z])|電話|レジ|責|No\.|領収|http|登録番号'
+    r'|店$|店舗|〒|丁目|ありがとう|いらっしゃいませ|毎度',
+    re.IGNORECASE
+)
+_RECEIPT_QUANTITY = [
+    # x/X は空白か金額の後にあるときだけ掛け算とみなす(「BOX 5P」「MサイズX10」は数量ではない)
+    re.compile(r'(?:[×*]|(?<=[\s\d])[xX])\s*(\d{1,2})(?!\d)'),
+    # 「10個入」「6コ入り」「5箱」「10枚」などは内容量なので数えない
+    re.compile(r'(?<!\d)(\d{1,2})\s*(?:個|コ|ケ|点)(?!\s*入)'),
+]
+_RECEIPT_UNIT_PRICE = re.compile(r'(?:@|単)\s*¥?\s*([\d,]+)')
+_RECEIPT_YEN_PRICE = re.compile(r'¥\s*(-?[\d,]+)')
+_RECEIPT_TRAILING_PRICE = re.compile(r'(?<![\d.,])(-?\d{1,3}(?:,\d{3})+|-?\d{2,6})\s*円?\s*[*※軽外内]?$')
+_RECEIPT_JAN = re.compile(r'(?<!\d)\d{8}(?:\d{5})?(?!\d)')
+_RECEIPT_NUMERIC_ONLY = re.compile(r'^[\d\s,¥円@×xX*単個コケ点※軽外内-]+$')
+
+def _receipt_int(value):
+    return int(value.replace(',', ''))
+
+def iter_receipt_lines(lines):
+    """レシートの各行を分類して順に返す(header/item/quantity/price/discount/total)
+    
+    1行ずつ処理するのでレシートの長さに比例した時間で済む。
+    返す辞書は kind, text, name(商品名の表記), quantity, unit_price, price を持つ(該当しない値はNone)。
+    """
+    for raw in lines:
+        raw = raw.strip()
+        if not raw:
+            continue
+        line = unicodedata.normalize('NFKC', raw).replace('\\', '¥')
+        parsed = {'kind': None, 'text': raw, 'name': '', 'quantity': None, 'unit_price': None, 'price': None}
+        
+        if _RECEIPT_TOTAL.search(line):
+            parsed['kind'] = 'total'
+        elif _RECEIPT_DISCOUNT.search(line):
+            parsed['kind'] = 'discount'
+        elif _RECEIPT_HEADER.search(line):
+            parsed['kind'] = 'header'
+        
+        # JANコードは数量や金額と取り違えないよう先に取り除く
+        body = _RECEIPT_JAN.sub(' ', line)
+        
+        unit_price = _RECEIPT_UNIT_PRICE.search(body)
+        if unit_price:
+            parsed['unit_price'] = _receipt_int(unit_price.group(1))
+            body = body[:unit_price.start()] + ' ' + body[unit_price.end():]
+        for pattern in _RECEIPT_QUANTITY:
+            quantity = pattern.search(body)
+            if quantity and int(quantity.group(1)) > 0:
+                parsed['quantity'] = int(quantity.group(1))
+                body = body[:quantity.start()] + ' ' + body[quantity.end():]
+                break
+        
+        body = body.rstrip()
+        price = list(_RECEIPT_YEN_PRICE.finditer(body)) or list(_RECEIPT_TRAILING_PRICE.finditer(body))
+        if price:
+            parsed['price'] = _receipt_int(price[-1].group(1))
+            body = body[:price[-1].start()] + body[price[-1].end():]
+        # 数量・金額・コードを除いた残りを商品名の表記とする
+        parsed['name'] = re.sub(r'\s+', ' ', body.strip(' *※¥')).strip()
+        
+        if parsed['kind'] is None:
+            if _RECEIPT_NUMERIC_ONLY.match(line):
+                # 商品名のない行は直前の商品の数量行か金額行
+                parsed['kind'] = 'quantity' if parsed['quantity'] or parsed['unit_price'] else 'price'
+            else:
+                parsed['kind'] = 'item'
+        
+        if parsed['kind'] == 'discount' and parsed['price'] is not None:
+            parsed['price'] = -abs(parsed['price'])
+        yield parsed
+
+def parse_receipt_text(text, df, aliases=None, data_key=None):
+    """レシートのテキストから商品と数量・金額を抽出(同じ商品は数量を合算)
+    
+    照合は 学習済みの別名 → 完全一致 → あいまい照合 の順に行い、結果の match に記録する。
+    別名はユーザーが確定した対応なので、部分一致(「減塩しょうゆ」の「塩」など)より優先する。
+    どれにも当たらなかった金額付きの行も name=None、match='none' で返し、確認画面で対応を選べるようにする。
+    data_key(inventory_key)を渡すと照合用のインデックスを項目名が変わるまで使い回す。
+    """
+    names = df['項目名']
+    if data_key is None:
+        data_key = tuple(names.astype(str))
+    matcher = get_receipt_matcher(data_key, names)
+    fuzzy_matcher = None
+    known = None
+    detected = {}
+    current = None  # 直前の商品(続く数量行・金額行・値引行を結び付ける)
+    
+    for line in iter_receipt_lines(text.split('\n')):
+        kind = line['kind']
+        if kind == 'item':
+            current = None
+            item_name, score = None, 1.0
+            if aliases is not None and len(aliases):
+                if known is None:
+                    known = set(names.astype(str))
+                item_name, match = aliases.lookup(line['name']), 'alias'
+                if item_name not in known:
+                    item_name = None
+            if item_name is None:
+                item_name, match = matcher.longest_match(line['text']), 'exact'
+            if item_name is None:
+                if fuzzy_matcher is None:
+                    fuzzy_matcher = get_fuzzy_matcher(data_key, names)
+                item_name, score = fuzzy_matcher.match(line['name'])
+                match = 'fuzzy'
+            if item_name is None:
+                if not line['name']:
+                    continue
+                match, score = 'none', 0.0
+            quantity = line['quantity'] or 1
+            price = line['price']
+            if price is None and line['unit_price'] is not None:
+                price = line['unit_price'] * quantity
+            
+            # 照合できなかった行は表記ごとにまとめる
+            key = item_name if item_name is not None else (None, line['name'])
+            item = detected.setdefault(key, {
+                'name': item_name, 'quantity': 0, 'price': None,
+                'match': match, 'score': score, 'source': line['name']
+            })
+            item['quantity'] += quantity
+            if price is not None:
+                item['price'] = (item['price'] or 0) + price
+            current = (item, quantity, price is not None)
+        elif current is not None and kind == 'quantity':
+            item, counted, has_price = current
+            if line['quantity']:
+                item['quantity'] += line['quantity'] - counted
+                counted = line['quantity']
+            price = line['price']
+            if price is None and line['unit_price'] is not None:
+                price = line['unit_price'] * counted
+            if price is not None and not has_price:
+                item['price'] = (item['price'] or 0) + price
+                has_price = True
+            current = (item, counted, has_price)
+        elif current is not None and kind == 'price':
+            item, counted, has_price = current
+            if not has_price and line['price'] is not None:
+                item['price'] = (item['price'] or 0) + line['price']
+                current = (item, counted, True)
+        elif current is not None and kind == 'discount':
+            item = current[0]
+            if line['price'] is not None and item['price'] is not None:
+                item['price'] += line['price']
+        elif kind == 'total':
+            current = None
+    
+    # 照合できず金額も付かなかった行は商品ではない(宣伝文句など)とみなす
+    return [item for item in detected.values() if item['name'] is not None or item['price'] is not None]
+
+def classify_stock(df):
+    """予備数と補充しきい値から在庫状態列(out/low/ok)を計算"""
+    stock = df['予備数'].to_numpy(dtype='int64', na_value=0)
+    threshold = df['補充しきい値'].to_numpy(dtype='int64', na_value=0)
+    status = np.select([stock >= threshold, stock == 0], ['ok', 'out'], default='low')
+    df['_在庫状態'] = pd.Categorical(status, categories=['out', 'low', 'ok'])
+    return df
+
+def classify_expiry(df, now=None):
+    """賞味期限から残り日数と期限ステータス列をまとめて計算"""
+    if now is None:
+        now = pd.Timestamp.now()
+    
+    days_left = (df['賞味期限'] - now).dt.days
+    
+    df['_残り日数'] = days_left
+    df['_期限状態'] = pd.cut(
+        days_left,
+        bins=[float('-inf'), -1, 3, 7, float('inf')],
+        labels=['expired', 'critical', 'warning', 'ok']
+    )
+    return df
+
+def iter_items(df, columns):
+    """行ごとに (index, 列の値...) のタプルを返す(pandasの行オブジェクトを作らない)"""
+    return zip(df.index.tolist(), *(df[col].tolist() for col in columns))
+
+def add_pending_edit(item_name, delta):
+    """まとめて編集の保留中の増減を加算(差し引き0になったら削除)"""
+    total = st.session_state.pending_edits.get(item_name, 0) + delta
+    if total:
+        st.session_state.pending_edits[item_name] = total
+    else:
+        st.session_state.pending_edits.pop(item_name, None)
+
+def discard_pending_edits():
+    st.session_state.pending_edits = {}
+
+# カタカナ→ひらがなの変換表
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(ord('ァ'), ord('ヶ') + 1)}
+
+def normalize_text(text):
+    """検索用に正規化(全角/半角の統一、小文字化、カタカナ→ひらがな)"""
+    return unicodedata.normalize('NFKC', str(text)).lower().translate(_KATAKANA_TO_HIRAGANA)
+
+class SearchIndex:
+    """項目名の文字n-gram(1文字・2文字)転置インデックス"""
+    
+    def __init__(self, names):
+        self.names = [normalize_text(name) for name in names]
+        self.postings = defaultdict(set)
+        for position, name in enumerate(self.names):
+            for gram in self._grams(name, 1) | self._grams(name, 2):
+                self.postings[gram].add(position)
+    
+    @staticmethod
+    def _grams(text, n):
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+    
+    def search(self, query):
+        """クエリを含む項目名の行位置を返す"""
+        query = normalize_text(query).strip()
+        if not query:
+            return list(range(len(self.names)))
+        
+        grams = self._grams(query, 2) if len(query) >= 2 else {query}
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set.intersection(*postings)
+        
+        # n-gramの一致だけでは並びが保証されないので候補だけ部分一致を確認
+        return sorted(position for position in candidates if query in self.names[position])
+
+def inventory_key(tenant):
+    """表示中の在庫の項目名・カテゴリの版(インデックスのキャッシュキー。在庫数の増減では変わらない)"""
+    return (tenant.id, st.session_state.get('names_revision'))
+
+@st.cache_resource(max_entries=4)
+def get_search_index(data_key, _names):
+    """項目名が変わるまで検索インデックスを再利用(_names はハッシュしない)"""
+    return SearchIndex(_names.astype(str).tolist())
+
+class CategoryIndex:
+    """カテゴリ順の並び(安定ソート)とカテゴリごとの行位置"""
+    
+    def __init__(self, labels):
+        self.labels = labels
+        self.order = sorted(range(len(labels)), key=labels.__getitem__)
+        self.rank = [0] * len(labels)
+        self.partitions = {}
+        for rank, position in enumerate(self.order):
+            self.rank[position] = rank
+            self.partitions.setdefault(labels[position], []).append(position)
+        self.categories = list(self.partitions)
+    
+    def select(self, category=None, subset=None):
+        """カテゴリ順の行位置を返す(categoryでカテゴリ、subsetで行を絞り込み)"""
+        positions = self.order if category is None else self.partitions.get(category, [])
+        if subset is None:
+            return positions
+        
+        # 絞り込み結果が小さければそれだけを並べ替える
+        if len(subset) < len(positions):
+            subset = [p for p in subset if category is None or self.labels[p] == category]
+            return sorted(subset, key=self.rank.__getitem__)
+        subset = set(subset)
+        return [p for p in positions if p in subset]
+
+@st.cache_resource(max_entries=4)
+def get_category_index(data_key, _labels):
+    """カテゴリが変わるまで並びを再利用(_labels はハッシュしない)"""
+    return CategoryIndex(_labels.astype(str).tolist())
+
+def render_profile_panel(profiler):
+    """サイドバーに計測結果(前回の再実行の内訳、API呼び出し、p50/p95)を表示"""
+    with st.expander("⏱ プロファイル"):
+        last_profile = st.session_state.get('last_profile')
+        if last_profile:
+            st.caption(f"前回の再実行: {last_profile['total_ms']:.1f}ms ({last_profile['time']})")
+            st.dataframe(pd.DataFrame(last_profile['spans']), hide_index=True, use_container_width=True)
+        
+        st.caption("API呼び出し")
+        calls = [
+            {'api': name[:-len('.calls')], 'calls': count, 'bytes': profiler.counters[name[:-len('.calls')] + '.bytes']}
+            for name, count in sorted(profiler.counters.items()) if name.endswith('.calls')
+        ]
+        if calls:
+            st.dataframe(pd.DataFrame(calls), hide_index=True, use_container_width=True)
+        
+        st.caption("直近のp50/p95(ms)")
+        st.dataframe(pd.DataFrame(profiler.percentiles()), hide_index=True, use_container_width=True)
+
+# 在庫一覧の1ページあたりの表示件数
+PAGE_SIZE_OPTIONS = [20, 50, 100]
+
+def main():
+    # セッション状態の初期化
+    if 'pending_edits' not in st.session_state:
+        st.session_state.pending_edits = {}
+
+    # ヘッダー
+    st.markdown("""
+    <div class="app-header">
+        <div class="app-title">🏠 おうち在庫管理システム</div>
+        <div class="app-subtitle">いつでも、どこでも、在庫チェック</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+    # メイン処理
+    profiler = get_profiler()
+    try:
+        profiler.phase('load')
+        registry = get_tenant_registry()
+        tenant_id = resolve_tenant_id(registry)
+        if tenant_id is None:
+            st.error("世帯が見つからないか、アクセスキーが正しくありません(URLの ?household= と key を確認してください)")
+            st.stop()
+        
+        missing_keys = registry.configs[tenant_id].get("missing_keys")
+        if missing_keys:
+            st.error(f"設定エラー: tenants.{tenant_id} に {', '.join(missing_keys)} を指定してください")
+            st.stop()
+        
+        with st.spinner("在庫データを読み込んでいます..."):
+            tenant = registry.get(tenant_id)
+        
+        if tenant is None:
+            st.error("Google Sheetsに接続できませんでした")
+            st.stop()
+        
+        # 世帯を切り替えたらセッション内の編集状態を持ち越さない
+        if st.session_state.get('tenant_id') != tenant_id:
+            st.session_state.tenant_id = tenant_id
+            st.session_state.sheet_snapshot = None
+            st.session_state.inventory_frame = None
+            st.session_state.pending_edits = {}
+        
+        store, sheet_sync = tenant.store, tenant.sync
+        with st.spinner("在庫データを読み込んでいます..."):
+            df = load_data(tenant)
+            st.session_state.shopping_revision = tenant.shopping.refresh()
+        
+        if df is None or df.empty:
+            st.warning("データが見つかりませんでした")
+            st.stop()
+        
+        # ストレージとキャッシュの状態(サイドバー)
+        with st.sidebar:
+            cache = tenant.cache
+            st.markdown("#### ⚙️ ストレージ")
+            if len(registry.configs) > 1:
+                st.caption(f"世帯: {tenant.name}")
+            st.caption(f"保存先: {store.name}")
+            if sheet_sync is not None:
+                last_synced = sheet_sync.last_synced.strftime('%H:%M:%S') if sheet_sync.last_synced else '未同期'
+                st.caption(f"Google Sheets同期: {last_synced}({sheet_sync.interval}秒ごと)")
+                if sheet_sync.last_error:
+                    st.caption(f"同期エラー: {sheet_sync.last_error}")
+            if isinstance(store, WriteBehindStore):
+                st.caption(f"同期待ち: {store.depth}行 / 遅延: {store.lag:.1f}秒")
+                if store.last_error:
+                    st.caption(f"同期エラー(再試行中): {store.last_error}")
+            st.markdown("#### ⚙️ キャッシュ")
+            st.caption(f"ヒット: {cache.hits} / ミス: {cache.misses} (TTL {cache.ttl}秒)")
+            if st.button("🔄 再読み込み", use_container_width=True):
+                cache.invalidate()
+                st.rerun()
+            
+            # 他の端末での変更を自動で取り込む(poll_seconds=0で無効)
+            poll_seconds = get_config("cache").get("poll_seconds", 10)
+            if poll_seconds:
+                render_live_refresh(tenant, poll_seconds)
+            
+            if profiler.enabled:
+                render_profile_panel(profiler)
+        
+        profiler.phase('render.stats')
+        
+        # 統計情報の計算
+        total_items = len(df)
+        stock_counts = df['_在庫状態'].value_counts()
+        critical_items = int(stock_counts['out'])
+        warning_items = int(stock_counts['low'])
+        ok_items = int(stock_counts['ok'])
+        expiry_counts = df.loc[df['カテゴリ'] == '食料品', '_期限状態'].value_counts()
+        expiring_items = int(expiry_counts.get('expired', 0) + expiry_counts.get('critical', 0))
+        
+        # 統計情報 - 横並び
+        st.markdown(f"""
+        <div style="display: grid; grid-template-columns: repeat(3, 1fr); gap: 0.75rem; margin-bottom: 1.5rem;">
+            <div class="stat-card">
+                <div class="stat-value stat-ok">{ok_items}</div>
+                <div class="stat-label">在庫OK</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value stat-warning">{warning_items}</div>
+                <div class="stat-label">要注意</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-value stat-danger">{critical_items}</div>
+                <div class="stat-label">在庫切れ</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if expiring_items > 0:
+            st.markdown(f'<div class="expiry-alert" style="margin-bottom: 1rem;">⚠️ 期限切れ・期限間近の食料品: {expiring_items}件</div>', unsafe_allow_html=True)
+        
+        # タブ
+        tab1, tab2, tab3 = st.tabs(["📦 在庫一覧", "🛒 買うものリスト", "📸 レシート読み取り"])
+        
+        # タブ1: 在庫一覧
+        with tab1:
+            profiler.phase('render.在庫一覧')
+            # 新規追加ボタン
+            if st.button("➕ 新しいアイテムを追加", use_container_width=True):
+                st.session_state.show_add_form = True
+            
+            # 新規追加フォーム
+            if st.session_state.get('show_add_form', False):
+                with st.form("add_item_form"):
+                    st.markdown("### 新しいアイテムを追加")
+                    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        new_icon = st.text_input("アイコン(絵文字)", placeholder="🍶")
+                        new_name = st.text_input("項目名", placeholder="醤油")
+                        new_category = st.text_input("カテゴリ", placeholder="調味料")
+                    
+                    with col2:
+                        new_stock = st.number_input("在庫数", min_value=0, value=0)
+                        new_threshold = st.number_input("在庫下限", min_value=0, value=1)
+                        new_expiry = st.text_input("賞味期限(YYYY-MM-DD)", placeholder="2026-12-31")
+                    
+                    col_btn1, col_btn2 = st.columns(2)
+                    with col_btn1:
+                        submit = st.form_submit_button("追加", use_container_width=True)
+                    with col_btn2:
+                        cancel = st.form_submit_button("キャンセル", use_container_width=True)
+                    
+                    if submit and new_name:
+                        new_row = {
+                            'アイコン': new_icon,
+                            '項目名': new_name,
+                            'カテゴリ': new_category,
+                            '在庫数': new_stock,
+                            '予備数': new_stock,
+                            '補充しきい値': new_threshold,
+                            '賞味期限': new_expiry
+                        }
+                        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+                        if update_data(tenant, df):
+                            st.success(f"✓ {new_name}を追加しました!")
+                            st.session_state.show_add_form = False
+                            st.rerun()
+                    
+                    if cancel:
+                        st.session_state.show_add_form = False
+                        st.rerun()
+            
+            st.divider()
+            
+            # まとめて編集モード(➕/➖を保留して1回で保存)
+            batch_mode = st.toggle("まとめて編集", key="batch_mode", on_change=discard_pending_edits)
+            pending_edits = st.session_state.pending_edits
+            
+            if batch_mode and pending_edits:
+                st.info(f"未保存の変更: {len(pending_edits)}件")
+                col_commit, col_cancel = st.columns(2)
+                with col_commit:
+                    if st.button("✓ まとめて保存", use_container_width=True):
+                        missing = adjust_stock(tenant, pending_edits)
+                        if missing is not None:
+                            discard_pending_edits()
+                            report_missing_items(missing)
+                            if not missing:
+                                st.rerun()
+                with col_cancel:
+                    if st.button("✕ 取り消し", use_container_width=True):
+                        discard_pending_edits()
+                        st.rerun()
+            
+            # 検索バーとフィルター
+            search_query = st.text_input("🔍 検索", placeholder="項目名で検索...", label_visibility="collapsed")
+            
+            col_filter1, col_filter2 = st.columns(2)
+            
+            with col_filter1:
+                category_index = get_category_index(inventory_key(tenant), df['カテゴリ'])
+                categories = ['すべて'] + category_index.categories
+                category_filter = st.selectbox("カテゴリー", categories, label_visibility="collapsed", key="category_filter")
+            
+            with col_filter2:
+                filter_option = st.radio("表示", ["すべて", "要補充", "在庫OK"], horizontal=True, label_visibility="collapsed")
+            
+            # フィルター適用(検索とカテゴリはインデックスから行位置を引く)
+            matched = None
+            if search_query:
+                matched = get_search_index(inventory_key(tenant), df['項目名']).search(search_query)
+            
+            positions = category_index.select(None if category_filter == 'すべて' else category_filter, matched)
+            display_df = df.iloc[positions]
+            
+            if filter_option == "要補充":
+                display_df = display_df[display_df['_在庫状態'] != 'ok']
+            elif filter_option == "在庫OK":
+                display_df = display_df[display_df['_在庫状態'] == 'ok']
+            
+            if display_df.empty:
+                st.info("表示するアイテムがありません")
+            else:
+                # ページ分割(表示中のページの行だけウィジェットを作る)
+                filter_key = (search_query, category_filter, filter_option)
+                if st.session_state.get('list_filter_key') != filter_key:
+                    st.session_state.list_filter_key = filter_key
+                    st.session_state.list_page = 0
+                
+                page_size = st.session_state.get('page_size', PAGE_SIZE_OPTIONS[0])
+                page_count = max(1, -(-len(display_df) // page_size))
+                page = min(st.session_state.get('list_page', 0), page_count - 1)
+                st.session_state.list_page = page
+                page_df = display_df.iloc[page * page_size:(page + 1) * page_size]
+                
+                page_rows = iter_items(page_df, ['項目名', 'アイコン', 'カテゴリ', '予備数', '補充しきい値', '_期限状態', '_残り日数'])
+                for index, name, icon, category, stock, threshold, expiry_status, days_left in page_rows:
+                    pending_delta = pending_edits.get(name, 0) if batch_mode else 0
+                    current_stock = int(stock) + pending_delta
+                    threshold = int(threshold)
+                    
+                    # 賞味期限チェック(load_dataで計算済みの列を参照)
+                    if category != '食料品':
+                        expiry_status = None
+                    
+                    # 横並びレイアウト
+                    col1, col2, col3, col4 = st.columns([4, 1.2, 0.9, 0.9])
+                    
+                    with col1:
+                        category_class = f"category-{category}" if category else ""
+                        category_badge = f'<span class="category-badge {category_class}">{category}</span>' if category else ''
+                        
+                        expiry_html = ""
+                        if expiry_status == 'expired':
+                            expiry_html = f'<div class="expiry-alert">⚠️ 期限切れ</div>'
+                        elif expiry_status == 'critical':
+                            expiry_html = f'<div class="expiry-alert">⚠️ 期限まであと{int(days_left)}日</div>'
+                        elif expiry_status == 'warning':
+                            expiry_html = f'<div class="expiry-warning">期限まであと{int(days_left)}日</div>'
+                        
+                        pending_html = f' <strong>({pending_delta:+d} 未保存)</strong>' if pending_delta else ''
+                        
+                        st.markdown(f"""
+                        <div class="item-row-inline">
+                            <div class="item-name">{icon} {category_badge}{name}</div>
+                            <div class="item-stock">在庫: {current_stock}個 / 在庫下限: {threshold}個{pending_html}</div>
+                            {expiry_html}
+                        </div>
+                        """, unsafe_allow_html=True)
+                    
+                    with col2:
+                        if st.button("残りわずか", key=f"low_{index}", use_container_width=True):
+                            if update_shopping_list(tenant, 'add', 'low', name):
+                                st.success("買うものリストに追加!")
+                                st.rerun()
+                    
+                    with col3:
+                        if st.button("➖", key=f"minus_{index}", use_container_width=True):
+                            if batch_mode:
+                                if current_stock > 0:
+                                    add_pending_edit(name, -1)
+                                st.rerun()
+                            missing = adjust_stock(tenant, {name: -1})
+                            report_missing_items(missing)
+                            if missing == []:
+                                st.rerun()
+                    
+                    with col4:
+                        if st.button("➕", key=f"plus_{index}", use_container_width=True):
+                            if batch_mode:
+                                add_pending_edit(name, 1)
+                                st.rerun()
+                            missing = adjust_stock(tenant, {name: 1})
+                            report_missing_items(missing)
+                            if missing == []:
+                                st.rerun()
+                
+                # ページ送り
+                col_prev, col_page, col_next = st.columns([1, 2, 1])
+                with col_prev:
+                    if st.button("◀ 前へ", key="page_prev", disabled=page == 0, use_container_width=True):
+                        st.session_state.list_page = page - 1
+                        st.rerun()
+                with col_page:
+                    st.markdown(f'<div style="text-align: center; color: #6b7280; padding-top: 0.5rem;">{page + 1} / {page_count} ページ(全{len(display_df)}件)</div>', unsafe_allow_html=True)
+                with col_next:
+                    if st.button("次へ ▶", key="page_next", disabled=page >= page_count - 1, use_container_width=True):
+                        st.session_state.list_page = page + 1
+                        st.rerun()
+                
+                st.selectbox("1ページの表示件数", PAGE_SIZE_OPTIONS, key="page_size")
+        
+        # タブ2: 買うものリスト
+        with tab2:
+            profiler.phase('render.買うものリスト')
+            # 単発追加フォーム
+            with st.form("manual_add", clear_on_submit=True):
+                st.markdown("### 📝 単発で追加")
+                col1, col2 = st.columns([4, 1])
+                with col1:
+                    manual_item = st.text_input("買うもの", placeholder="ティッシュ、シャンプーなど...", label_visibility="collapsed")
+                with col2:
+                    add_manual = st.form_submit_button("追加", use_container_width=True)
+                
+                if add_manual and manual_item:
+                    if update_shopping_list(tenant, 'add', 'manual', manual_item):
+                        st.success(f"✓ {manual_item}を追加しました!")
+                        st.rerun()
+            
+            st.divider()
+            
+            # 在庫切れアイテム
+            to_buy = df[df['_在庫状態'] != 'ok']
+            
+            # 残りわずかアイテムと単発メモ(全端末で共有)
+            low_stock_df = df[df['項目名'].isin(tenant.shopping.items('low'))]
+            manual_shopping_list = tenant.shopping.items('manual')
+            
+            total_items_to_buy = len(to_buy) + len(low_stock_df) + len(manual_shopping_list)
+            
+            if total_items_to_buy > 0:
+                st.markdown(f'<h3 style="color: #1f2937;">買うものリスト ({total_items_to_buy}個)</h3>', unsafe_allow_html=True)
+                
+                # 在庫切れ
+                if not to_buy.empty:
+                    st.markdown('<h4 style="color: #1f2937;">📦 在庫切れ</h4>', unsafe_allow_html=True)
+                    for index, name, icon, stock, threshold in iter_items(to_buy, ['項目名', 'アイコン', '予備数', '補充しきい値']):
+                        shortage = int(threshold) - int(stock)
+                        
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.markdown(f"""
+                            <div class="shopping-item">
+                                <div class="shopping-item-name">{icon} {name}</div>
+                                <div class="shopping-item-detail">現在 {stock}個 → あと{shortage}個必要</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        
+                        with col2:
+                            if st.button("✓", key=f"bought_{index}", use_container_width=True):
+                                # 表示していた在庫から下限までの不足分を購入分として加算
+                                missing = adjust_stock(tenant, {name: int(threshold) - int(stock)})
+                                report_missing_items(missing)
+                                if missing == []:
+                                    st.success("✓")
+                                    st.rerun()
+                
+                # 残りわずか
+                if not low_stock_df.empty:
+                    st.markdown('<h4 style="color: #1f2937;">⚠️ 残りわずか</h4>', unsafe_allow_html=True)
+                    for index, name, icon, stock in iter_items(low_stock_df, ['項目名', 'アイコン', '予備数']):
+                        
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.markdown(f"""
+                            <div class="shopping-item">
+                                <div class="shopping-item-name">{icon} {name}</div>
+                                <div class="shopping-item-detail">在庫: {stock}個</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        
+                        with col2:
+                            if st.button("削除", key=f"remove_low_{index}", use_container_width=True):
+                                if update_shopping_list(tenant, 'remove', 'low', name):
+                                    st.rerun()
+                
+                # 単発追加アイテム
+                if manual_shopping_list:
+                    st.markdown('<h4 style="color: #1f2937;">📝 単発メモ</h4>', unsafe_allow_html=True)
+                    for idx, item in enumerate(manual_shopping_list):
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.markdown(f"""
+                            <div class="manual-item">
+                                <div class="manual-item-name">📌 {item}</div>
+                            </div>
+                            """, unsafe_allow_html=True)
+                        
+                        with col2:
+                            if st.button("削除", key=f"remove_manual_{idx}", use_container_width=True):
+                                if update_shopping_list(tenant, 'remove', 'manual', item):
+                                    st.rerun()
+                
+                # コピー用リスト
+                with st.expander("📋 コピー用リスト"):
+                    all_items = []
+                    for name in to_buy['項目名'].tolist() + low_stock_df['項目名'].tolist():
+                        all_items.append(f"□ {name}")
+                    for item in manual_shopping_list:
+                        all_items.append(f"□ {item}")
+                    
+                    shopping_list = "\n".join(all_items)
+                    st.text_area("コピー用リスト", shopping_list, height=200, label_visibility="collapsed")
+            else:
+                st.success("🎉 すべての在庫が十分です!")
+        
+        # タブ3: レシート読み取り
+        with tab3:
+            profiler.phase('render.レシート読み取り')
+            st.markdown('<h3 style="color: #1f2937;">📸 レシートを撮影して自動補充</h3>', unsafe_allow_html=True)
+            st.info("レシートの写真をアップロードすると、購入した商品を自動で判別して在庫を補充します")
+            
+            uploaded_files = st.file_uploader("レシートの写真を選択", type=["jpg", "jpeg", "png"], accept_multiple_files=True, label_visibility="collapsed")
+            
+            if uploaded_files:
+                with st.spinner(f"レシートを読み取っています...({len(uploaded_files)}枚)"):
+                    # 送信量を減らすため、OCRの前に画像を軽量化する
+                    preprocessed = preprocess_uploaded_images(uploaded_files)
+                    ocr_results = detect_texts_from_images([image_bytes for image_bytes, _ in preprocessed])
+                
+                for file_idx, (uploaded_file, ocr_result) in enumerate(zip(uploaded_files, ocr_results)):
+                    if file_idx > 0:
+                        st.divider()
+                    
+                    col1, col2 = st.columns([1, 1])
+                    with col1:
+                        st.image(uploaded_file, caption=uploaded_file.name, use_container_width=True)
+                        stats = preprocessed[file_idx][1]
+                        if stats is not None:
+                            st.caption(f"送信サイズ: {format_bytes(stats['original_bytes'])} → {format_bytes(stats['bytes'])}(前処理 {stats['ms']:.0f}ms)")
+                    
+                    with col2:
+                        receipt_text = ocr_result['text']
+                        
+                        if receipt_text:
+                            st.success("✅ 読み取り完了!")
+                            
+                            with st.expander("📄 読み取ったテキスト"):
+                                st.text(receipt_text)
+                            
+                            detected_items = parse_receipt_text(receipt_text, df, tenant.aliases, inventory_key(tenant))
+                            
+                            if detected_items:
+                                st.markdown('<h4 style="color: #1f2937;">検出された商品:</h4>', unsafe_allow_html=True)
+                                # 反映済みの記録は元の画像のハッシュで引く(OCRのキャッシュは前処理後の画像がキーなので、
+                                # 前処理の設定を変えても同じレシートを二重に反映しないよう別にしている)
+                                render_receipt_preview(tenant, df, detected_items, OcrCache.key(uploaded_file.getvalue()))
+                            else:
+                                st.warning("⚠️ 商品の行が見つかりませんでした")
+                        elif ocr_result['error']:
+                            st.error(f"❌ 読み取りに失敗しました: {ocr_result['error']}")
+                        else:
+                            st.error("❌ テキストを読み取れませんでした。もう一度試してください。")
+            else:
+                st.markdown("""
+                <div style="color: #1f2937;">
+                
+                ### 📱 使い方
+                
+                1. **レシートを撮影**してアップロード(複数枚まとめてOK)
+                2. **自動で商品名を検出**
+                3. **内容を確認**して「まとめて在庫に追加」で補充(同じレシートは二重に追加されません)
+                
+                #### 💡 ヒント
+                - レシート全体が写るように撮影してください
+                - 明るい場所で撮影するとより正確です
+                - 商品名が在庫リストに登録されている必要があります(略した表記も追加すると覚えます)
+                
+                </div>
+                """, unsafe_allow_html=True)
+
+    except Exception as e:
+        st.error("エラーが発生しました")
+        with st.expander("詳細"):
+            st.code(str(e))
+
+if __name__ == "__main__":
+    profiler = get_profiler()
+    profiler.start_rerun()
+    try:
+        main()
+    finally:
+        last_profile = profiler.end_rerun()
+        if last_profile is not None:
+            st.session_state.last_profile = last_profile
@@ -0,0 +1,77 @@
+"""コールドスタートの計測(新しいPythonプロセスでの import 時間と最初の描画までの時間)
+
+    python benchmarks/bench_cold_start.py [--app PATH] [--rows 1000] [--repeat 3]
+
+変更前と比べるときは、古い app.py を取り出して --app で指定する:
+
+    git show <commit>:app.py > /tmp/app_before.py
+    python benchmarks/bench_cold_start.py --app /tmp/app_before.py
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from synthetic import synthetic_records
+import app
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+# app.py を読み込むだけ(streamlit run 以外では main() は実行されない)
+IMPORT_CHILD = '''
+import sys, time
+sys.path.insert(0, {bench_dir!r})
+import synthetic  # streamlit 自体の読み込みと警告の抑制は計測に含めない
+import importlib.util
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("app_under_test", {app_path!r})
+spec.loader.exec_module(importlib.util.module_from_spec(spec))
+print((time.perf_counter() - start) * 1000)
+'''
+
+# 最初の再実行(接続・読み込み・描画)が終わるまで
+RENDER_CHILD = '''
+import sys, time
+sys.path.insert(0, {bench_dir!r})
+import synthetic
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app_path!r}, default_timeout=600)
+at.secrets["storage"] = {{"backend": "sqlite", "sqlite_path": {db_path!r}, "sync_interval": 0}}
+at.secrets["ocr"] = {{"backend": "fake"}}
+start = time.perf_counter()
+at.run()
+elapsed = (time.perf_counter() - start) * 1000
+if at.exception or at.error:
+    sys.exit(f"描画に失敗しました: {{[e.value for e in [*at.exception, *at.error]]}}")
+print(elapsed)
+'''
+
+def run_child(code):
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=str(Path(app.__file__).resolve()))
+    parser.add_argument('--rows', type=int, default=1_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = str(Path(tmp) / 'inventory.db')
+        app.SQLiteStore(db_path).write(None, app.records_to_values(synthetic_records(args.rows)))
+        
+        params = {'bench_dir': str(BENCH_DIR), 'app_path': args.app, 'db_path': db_path}
+        imports = [run_child(IMPORT_CHILD.format(**params)) for _ in range(args.repeat)]
+        renders = [run_child(RENDER_CHILD.format(**params)) for _ in range(args.repeat)]
+    
+    print(f"app: {args.app} ({args.rows} rows)")
+    print(f"import app.py        median {statistics.median(imports):8.1f} ms")
+    print(f"time to first render median {statistics.median(renders):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
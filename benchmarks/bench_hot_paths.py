@@ -0,0 +1,119 @@
+"""主要な処理の処理時間とAPI呼び出し回数のベンチマーク
+
+    python benchmarks/bench_hot_paths.py [--sizes 100 1000 10000 100000] [--repeat 5]
+
+Google Sheetsの代わりにメモリ上の FakeWorksheet を使い、Vision APIは使わない。
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import synthetic_records
+from fake_sheet import FakeWorksheet
+import app
+
+def measure(fn, repeat):
+    """fn を repeat 回実行して中央値(ミリ秒)を返す"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def synthetic_receipt(records, lines=40, seed=0):
+    """登録商品名・価格・ノイズが混ざったレシートのテキスト"""
+    rng = random.Random(seed)
+    receipt = ['スーパーおうち 〇〇店', '2026年10月18日 12:34', 'レジ#03 責No.1234']
+    for _ in range(lines):
+        if rng.random() < 0.7:
+            receipt.append(f"{rng.choice(records)['項目名']} {rng.randint(1, 3)}個 ¥{rng.randint(98, 598)}")
+        else:
+            receipt.append(f"値引 -{rng.randint(10, 50)}")
+    receipt += ['小計 ¥3,210', '合計 ¥3,467', 'お預り ¥5,000', 'お釣り ¥1,533']
+    return '\n'.join(receipt)
+
+def bench_storage(records, repeat):
+    sheet = FakeWorksheet(records)
+    store = app.GoogleSheetStore(sheet)
+    results = []
+    
+    def load():
+        return app.build_inventory_frame(store.fetch_records())
+    
+    sheet.reset_counters()
+    results.append(('load_data', measure(load, repeat), sheet.calls.copy(), 0))
+    
+    df = load()
+    base = app.to_sheet_values(df)
+    
+    def delta_write():
+        df.at[0, '予備数'] = int(df.at[0, '予備数']) + 1
+        store.write(base, app.to_sheet_values(df))
+    
+    sheet.reset_counters()
+    results.append(('update_data (差分)', measure(delta_write, repeat), sheet.calls.copy(), sheet.cells_written))
+    
+    def full_write():
+        store.write(None, app.to_sheet_values(df))
+    
+    sheet.reset_counters()
+    results.append(('update_data (全体書き直し)', measure(full_write, repeat), sheet.calls.copy(), sheet.cells_written))
+    
+    results.append(('classify_expiry', measure(lambda: app.classify_expiry(df), repeat), {}, 0))
+    
+    receipt = synthetic_receipt(records)
+    names = tuple(df['項目名'].astype(str))
+    results.append(('ReceiptMatcher 構築', measure(lambda: app.ReceiptMatcher(names), 1), {}, 0))
+    results.append(('FuzzyMatcher 構築', measure(lambda: app.FuzzyMatcher(names), 1), {}, 0))
+    fuzzy_matcher = app.FuzzyMatcher(names)
+    queries = [name[:-1] for name in names[:40]]
+    results.append(('FuzzyMatcher 40行', measure(lambda: [fuzzy_matcher.match(q) for q in queries], repeat), {}, 0))
+    app.parse_receipt_text(receipt, df)
+    results.append(('parse_receipt_text', measure(lambda: app.parse_receipt_text(receipt, df), repeat), {}, 0))
+    return results, sheet.calls
+
+def bench_rerun(records, repeat):
+    """画面全体の再実行1回分(SQLiteバックエンド、AppTest使用)"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+    
+    # ストアやキャッシュはプロセス全体で共有されるので件数ごとに作り直す
+    st.cache_resource.clear()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'inventory.db')
+        app.SQLiteStore(path).write(None, app.records_to_values(records))
+        
+        at = AppTest.from_file(str(Path(app.__file__)), default_timeout=600)
+        at.secrets['storage'] = {'backend': 'sqlite', 'sqlite_path': path, 'sync_interval': 0}
+        at.secrets['ocr'] = {'backend': 'fake'}
+        at.run()
+        if at.exception or at.error:
+            raise RuntimeError(f"再実行に失敗しました: {[e.value for e in [*at.exception, *at.error]]}")
+        return measure(at.run, repeat)
+
+def format_calls(calls):
+    return ', '.join(f"{name}={count}" for name, count in sorted(calls.items())) or '-'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-rerun', action='store_true', help='AppTestによる再実行の計測を省略')
+    args = parser.parse_args()
+    
+    print(f"{'operation':<28} {'rows':>7} {'median ms':>10} {'cells':>8}  API calls")
+    for n in args.sizes:
+        records = synthetic_records(n)
+        results, _ = bench_storage(records, args.repeat)
+        if not args.no_rerun:
+            results.append(('rerun (全タブ)', bench_rerun(records, args.repeat), {}, 0))
+        for name, ms, calls, cells in results:
+            print(f"{name:<28} {n:>7} {ms:>10.2f} {cells:>8}  {format_calls(calls)}")
+
+if __name__ == "__main__":
+    main()
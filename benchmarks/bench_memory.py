@@ -0,0 +1,41 @@
+"""在庫DataFrameのメモリ使用量ベンチマーク(旧: object/int64列、新: 型付き列)
+
+    python benchmarks/bench_memory.py
+
+どちらも計算列(_で始まる列)を含むDataFrame全体を測る。
+「new (/)」は賞味期限がシートの表示形式(YYYY/MM/DD)で返ってきた場合。
+"""
+import pandas as pd
+
+from synthetic import synthetic_records
+from app import INTEGER_COLUMNS, INVENTORY_COLUMNS, build_inventory_frame
+
+SIZES = [10_000, 100_000]
+
+def legacy_frame(records):
+    """型付き化する前の load_data と同じ変換"""
+    df = pd.DataFrame(records)
+    for col in INVENTORY_COLUMNS:
+        if col not in df.columns:
+            df[col] = ''
+    for col in INTEGER_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    return df
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+def with_slashed_dates(records):
+    return [{**record, '賞味期限': record['賞味期限'].replace('-', '/')} for record in records]
+
+def main():
+    print(f"{'rows':>8} {'old (MB)':>10} {'new (MB)':>10} {'ratio':>7} {'new (/) (MB)':>13}")
+    for n in SIZES:
+        records = synthetic_records(n)
+        old = frame_bytes(legacy_frame(records))
+        new = frame_bytes(build_inventory_frame(records))
+        slashed = frame_bytes(build_inventory_frame(with_slashed_dates(records)))
+        print(f"{n:>8} {old / 1e6:>10.2f} {new / 1e6:>10.2f} {new / old:>7.2f} {slashed / 1e6:>13.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""レシート画像の前処理(回転・切り抜き・縮小・グレースケール・再圧縮)のベンチマーク
+
+    python benchmarks/bench_preprocess.py [--dir レシート写真のフォルダ] [--count 5] [--mbps 5]
+
+--dir を指定しない場合は、スマートフォンの写真に近い合成画像(4032x3024、EXIFで回転指定)を使う。
+送信時間は --mbps の回線速度での概算。
+"""
+import argparse
+import io
+import random
+import statistics
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import synthetic  # noqa: F401  リポジトリ直下の app.py を import できるようにする
+import app
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+def synthetic_photo(seed=0, size=(3024, 4032)):
+    """机の上のレシートを撮影した画像(画素は横向きに保存し、EXIFのOrientation=6で縦に表示)"""
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed).normal(70, 25, (size[1], size[0], 3))
+    image = Image.fromarray(noise.clip(0, 255).astype(np.uint8))
+
+    # レシート用紙と印字
+    draw = ImageDraw.Draw(image)
+    left, top = rng.randint(700, 900), rng.randint(600, 900)
+    right, bottom = size[0] - rng.randint(700, 900), size[1] - rng.randint(600, 900)
+    draw.rectangle((left, top, right, bottom), fill=(235, 233, 228))
+    for y in range(top + 80, bottom - 80, 60):
+        text = f"ITEM {rng.randint(1000, 9999)}  x{rng.randint(1, 3)}  {rng.randint(98, 598)}"
+        draw.text((left + 60, y), text, fill=(30, 30, 30), font_size=40)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # 表示時に時計回りに90度回転
+    output = io.BytesIO()
+    image.rotate(90, expand=True).save(output, 'JPEG', quality=95, exif=exif)
+    return output.getvalue()
+
+def load_samples(directory, count):
+    if directory is None:
+        return [(f"synthetic_{i}.jpg", synthetic_photo(i)) for i in range(count)]
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [(p.name, p.read_bytes()) for p in paths]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dir', help='レシート写真のフォルダ(省略時は合成画像)')
+    parser.add_argument('--count', type=int, default=5, help='合成画像の枚数')
+    parser.add_argument('--mbps', type=float, default=5.0, help='送信時間の概算に使う上り回線速度')
+    parser.add_argument('--max-side', type=int, default=2000)
+    parser.add_argument('--quality', type=int, default=80)
+    args = parser.parse_args()
+
+    def upload_ms(size):
+        return size * 8 / (args.mbps * 1_000_000) * 1000
+
+    print(f"{'image':<24} {'before KB':>10} {'after KB':>9} {'saved':>7} {'prep ms':>8} {'upload ms (before→after)':>26}")
+    totals = []
+    for name, image_bytes in load_samples(args.dir, args.count):
+        processed, stats = app.preprocess_receipt_image(image_bytes, args.max_side, args.quality)
+        if stats is None:
+            print(f"{name:<24} 画像として読み込めませんでした")
+            continue
+        saved = 1 - stats['bytes'] / stats['original_bytes']
+        size = Image.open(io.BytesIO(processed)).size
+        print(
+            f"{name[:24]:<24} {stats['original_bytes'] / 1024:>10.0f} {stats['bytes'] / 1024:>9.0f} {saved:>7.0%} "
+            f"{stats['ms']:>8.1f} {upload_ms(stats['original_bytes']):>12.0f} → {upload_ms(stats['bytes']):>6.0f}  {size[0]}x{size[1]}"
+        )
+        totals.append((stats, saved))
+
+    if totals:
+        before = sum(stats['original_bytes'] for stats, _ in totals)
+        after = sum(stats['bytes'] for stats, _ in totals)
+        print(f"\n合計 {before / 1024 / 1024:.1f}MB → {after / 1024 / 1024:.1f}MB、"
+              f"削減率の中央値 {statistics.median(saved for _, saved in totals):.0%}、"
+              f"前処理の中央値 {statistics.median(stats['ms'] for stats, _ in totals):.0f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""gspread.Worksheet の代わりに使うメモリ上のワークシート"""
+from collections import Counter
+
+import gspread
+
+from app import records_to_values, values_to_records
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+    
+    def get_lastUpdateTime(self):
+        self.worksheet.calls['get_lastUpdateTime'] += 1
+        return str(self.worksheet.revision)
+
+class FakeWorksheet:
+    """API呼び出し回数と書き込んだセル数を記録するワークシート"""
+    
+    def __init__(self, records):
+        self.values = records_to_values(records)
+        self.revision = 0
+        self.calls = Counter()
+        self.cells_written = 0
+        self.spreadsheet = FakeSpreadsheet(self)
+    
+    def reset_counters(self):
+        self.calls.clear()
+        self.cells_written = 0
+    
+    def get_all_records(self):
+        self.calls['get_all_records'] += 1
+        return values_to_records(self.values)
+    
+    def clear(self):
+        self.calls['clear'] += 1
+        self.values = []
+        self.revision += 1
+    
+    def update(self, values, range_name='A1'):
+        self.calls['update'] += 1
+        self._write(range_name, values)
+    
+    def batch_update(self, data):
+        self.calls['batch_update'] += 1
+        for update in data:
+            self._write(update['range'], update['values'])
+    
+    def _write(self, range_name, values):
+        row, col = gspread.utils.a1_to_rowcol(range_name.split(':')[0])
+        for r, row_values in enumerate(values, row - 1):
+            while len(self.values) <= r:
+                self.values.append([])
+            target = self.values[r]
+            if len(target) < col - 1 + len(row_values):
+                target.extend([''] * (col - 1 + len(row_values) - len(target)))
+            target[col - 1:col - 1 + len(row_values)] = row_values
+            self.cells_written += len(row_values)
+        self.revision += 1
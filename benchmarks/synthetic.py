@@ -0,0 +1,35 @@
+"""ベンチマーク共通の設定と合成データ"""
+import random
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+from streamlit import logger
+
+# リポジトリ直下の app.py を import できるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# streamlit run 以外で実行したときの警告を抑える
+logger.set_log_level('error')
+
+CATEGORIES = ['食料品', '日用品', 'ベビー用品', '調味料']
+ICONS = ['🍶', '🥛', '🧻', '🍼', '🧂', '🍚', '🧴', '🥚']
+WORDS = ['醤油', '牛乳', 'ティッシュ', 'おむつ', '塩', '米', 'シャンプー', '卵', '味噌', 'パスタ', '洗剤', 'ヨーグルト']
+
+def synthetic_records(n, seed=0):
+    """get_all_records() と同じ形のレコードを n 件作成"""
+    rng = random.Random(seed)
+    today = date.today()
+    records = []
+    for i in range(n):
+        expiry = today + timedelta(days=rng.randint(-10, 60))
+        records.append({
+            'アイコン': rng.choice(ICONS),
+            '項目名': f"{rng.choice(WORDS)}{i}",
+            'カテゴリ': rng.choice(CATEGORIES),
+            '在庫数': rng.randint(0, 10),
+            '予備数': rng.randint(0, 10),
+            '補充しきい値': rng.randint(0, 5),
+            '賞味期限': expiry.strftime('%Y-%m-%d') if rng.random() < 0.6 else '',
+        })
+    return records
@@ -0,0 +1,12 @@
+import sys
+from pathlib import Path
+
+from streamlit import logger
+
+# リポジトリ直下の app.py と benchmarks のテスト用ワークシートを import できるようにする
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+# streamlit run 以外で実行したときの警告を抑える
+logger.set_log_level('error')
@@ -0,0 +1,69 @@
+"""在庫の増減(adjust_stock)のテスト"""
+import threading
+import types
+
+import app
+from fake_sheet import FakeWorksheet
+
+RECORDS = [
+    {'アイコン': '🍶', '項目名': '醤油', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 2, '補充しきい値': 1, '賞味期限': ''},
+    {'アイコン': '🧂', '項目名': '塩', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 1, '補充しきい値': 1, '賞味期限': ''},
+]
+
+def make_tenant(store, ttl=30):
+    return types.SimpleNamespace(store=store, cache=app.SnapshotCache(ttl), lock=threading.Lock())
+
+def stock(sheet, item_name):
+    header = sheet.values[0]
+    row = next(row for row in sheet.values[1:] if row[header.index('項目名')] == item_name)
+    return row[header.index('予備数')]
+
+def test_direct_sheet_edit_within_ttl_is_not_overwritten():
+    sheet = FakeWorksheet(RECORDS)
+    tenant = make_tenant(app.GoogleSheetStore(sheet))
+    tenant.cache.get_records(tenant.store)
+    
+    # キャッシュのTTL内にシートを直接編集する
+    sheet.values[1][sheet.values[0].index('予備数')] = 10
+    sheet.revision += 1
+    
+    assert app.adjust_stock(tenant, {'醤油': 1}) == []
+    assert stock(sheet, '醤油') == 11
+
+def test_missing_item_is_reported():
+    sheet = FakeWorksheet(RECORDS)
+    tenant = make_tenant(app.GoogleSheetStore(sheet))
+    assert app.adjust_stock(tenant, {'醤油': -1, '味噌': 1}) == ['味噌']
+    assert stock(sheet, '醤油') == 1
+
+def test_concurrent_sqlite_deltas_are_all_applied(tmp_path):
+    store = app.SQLiteStore(str(tmp_path / 'inventory.db'))
+    store.write(None, app.records_to_values(RECORDS))
+    
+    # プロセスごとにロックが別でも、加算はDB上で行われるので失われない
+    threads = [
+        threading.Thread(target=app.adjust_stock, args=(make_tenant(store), {'醤油': 1}))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {r['項目名']: r['予備数'] for r in store.fetch_records()}['醤油'] == 2 + 20
+
+def test_apply_receipt_records_partial_and_skips_double_submit(tmp_path):
+    store = app.SQLiteStore(str(tmp_path / 'inventory.db'))
+    store.write(None, app.records_to_values(RECORDS))
+    tenant = make_tenant(store)
+    tenant.receipts = app.AppliedReceipts(tmp_path / 'receipts.json')
+    
+    assert app.apply_receipt(tenant, 'h', {'醤油': 1, '味噌': 1}) == (['醤油'], ['味噌'])
+    assert not tenant.receipts.get('h')['complete']
+    
+    # 直した後の再送信では反映済みの醤油を数えない
+    assert app.apply_receipt(tenant, 'h', {'醤油': 1, '塩': 1}) == (['塩'], [])
+    assert tenant.receipts.get('h')['complete']
+    
+    # 二重送信では何も反映しない
+    assert app.apply_receipt(tenant, 'h', {'醤油': 1, '塩': 1}) == ([], [])
+    assert {r['項目名']: r['予備数'] for r in store.fetch_records()} == {'醤油': 3, '塩': 2}
@@ -0,0 +1,15 @@
+"""在庫DataFrameの作成と書き戻しのテスト"""
+import pandas as pd
+
+import app
+
+def test_expiry_text_is_kept_unless_changed():
+    texts = ['2026/10/25', '2026-10-25', '', 'なし', '2026年10月25日']
+    df = app.build_inventory_frame([{'項目名': str(i), '賞味期限': text} for i, text in enumerate(texts)])
+    # YYYY-MM-DD と同じ表記は元の値を持たない
+    assert df['_賞味期限_元'].isna().tolist() == [False, True, True, False, False]
+    
+    df.loc[0, '賞味期限'] = pd.Timestamp('2026-12-01')
+    values = app.to_sheet_values(df)
+    position = values[0].index('賞味期限')
+    assert [row[position] for row in values[1:]] == ['2026-12-01', '2026-10-25', '', 'なし', '2026年10月25日']
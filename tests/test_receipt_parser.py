@@ -0,0 +1,129 @@
+"""レシートの行の分類と商品の抽出のテスト"""
+import pandas as pd
+import pytest
+
+import app
+
+NAMES = ['卵', '牛乳', '醤油', 'ティッシュ', '食パン']
+
+def parse_line(text):
+    return next(app.iter_receipt_lines([text]))
+
+def parse(text):
+    df = pd.DataFrame({'項目名': NAMES})
+    return {item['name']: item for item in app.parse_receipt_text(text, df)}
+
+@pytest.mark.parametrize('text, quantity, price', [
+    ('牛乳 ×2 396', 2, 396),
+    ('牛乳 x 2 ¥396', 2, 396),
+    ('牛乳 2個 396', 2, 396),
+    ('牛乳 3コ 594円', 3, 594),
+    ('牛乳 198', None, 198),
+])
+def test_item_line(text, quantity, price):
+    line = parse_line(text)
+    assert line['kind'] == 'item'
+    assert line['name'] == '牛乳'
+    assert line['quantity'] == quantity
+    assert line['price'] == price
+
+@pytest.mark.parametrize('text', ['卵 10個入 198', '卵 6コ入り 158', '卵 10 個入り 198'])
+def test_package_size_is_not_quantity(text):
+    line = parse_line(text)
+    assert line['kind'] == 'item'
+    assert line['quantity'] is None
+    assert '入' in line['name']
+
+def test_package_size_with_quantity():
+    line = parse_line('卵 10個入 ×2 396')
+    assert line['quantity'] == 2
+    assert line['price'] == 396
+
+@pytest.mark.parametrize('text, name, price', [
+    ('UCC COFFEE 298', 'UCC COFFEE', 298),
+    ('HOTEL BREAD 198', 'HOTEL BREAD', 198),
+    ('ティッシュBOX 5P 398', 'ティッシュBOX 5P', 398),
+    ('卵 MサイズX10 248', '卵 MサイズX10', 248),
+])
+def test_letters_inside_words_are_not_markers(text, name, price):
+    line = parse_line(text)
+    assert line['kind'] == 'item'
+    assert line['name'] == name
+    assert line['quantity'] is None
+    assert line['price'] == price
+
+@pytest.mark.parametrize('text', ['牛乳 X2 396', '牛乳 198 x2', '牛乳*2 396'])
+def test_multiplier_after_space_or_price(text):
+    assert parse_line(text)['quantity'] == 2
+
+def test_jan_code_is_not_price():
+    line = parse_line('4901234567894 醤油 298')
+    assert line['name'] == '醤油'
+    assert line['price'] == 298
+
+@pytest.mark.parametrize('text, kind', [
+    ('2024/05/01 18:32', 'header'),
+    ('TEL 03-1234-5678', 'header'),
+    ('小計 ¥1,280', 'total'),
+    ('合計 ¥1,382', 'total'),
+    ('値引 -50', 'discount'),
+    ('20%OFF -40', 'discount'),
+    ('TEL03-1234-5678', 'header'),
+    ('2個 × 単198', 'quantity'),
+    ('¥396', 'price'),
+])
+def test_line_kind(text, kind):
+    assert parse_line(text)['kind'] == kind
+
+def test_discount_is_negative():
+    assert parse_line('割引 50').get('price') == -50
+
+def test_quantity_and_price_on_following_lines():
+    items = parse('牛乳\n2個 × 単198\n¥396\n')
+    assert items['牛乳']['quantity'] == 2
+    assert items['牛乳']['price'] == 396
+
+def test_coffee_is_not_discount():
+    df = pd.DataFrame({'項目名': NAMES + ['コーヒー']})
+    items = app.parse_receipt_text('食パン 158\nUCC COFFEE 298', df)
+    assert items[0]['name'] == '食パン'
+    assert items[0]['price'] == 158
+    assert [item['source'] for item in items[1:]] == ['UCC COFFEE']
+
+def test_discount_applies_to_previous_item():
+    items = parse('食パン 158\n値引 -30\n合計 ¥128')
+    assert items['食パン']['price'] == 128
+
+def test_same_item_is_summed():
+    items = parse('牛乳 198\n卵 10個入 248\n牛乳 ×2 396')
+    assert items['牛乳']['quantity'] == 3
+    assert items['牛乳']['price'] == 594
+    assert items['卵']['quantity'] == 1
+
+def test_totals_are_not_items():
+    items = parse('醤油 298\n小計 ¥298\n合計 ¥321\nお預り ¥1,000\nお釣 ¥679')
+    assert list(items) == ['醤油']
+
+def test_unmatched_item_is_listed():
+    df = pd.DataFrame({'項目名': NAMES})
+    items = app.parse_receipt_text('キッコーマンシヨウユ 298\n牛乳 198\n本日ポイント5倍デー', df)
+    unmatched = [item for item in items if item['name'] is None]
+    assert len(unmatched) == 1
+    assert unmatched[0]['source'] == 'キッコーマンシヨウユ'
+    assert unmatched[0]['match'] == 'none'
+    assert unmatched[0]['price'] == 298
+
+def test_line_without_price_is_not_unmatched_item():
+    df = pd.DataFrame({'項目名': NAMES})
+    items = app.parse_receipt_text('いつもご利用ありがとうございます\n旬の野菜フェア開催中\n牛乳 198', df)
+    assert [item['name'] for item in items] == ['牛乳']
+
+def test_learned_alias_overrides_substring_match(tmp_path):
+    df = pd.DataFrame({'項目名': ['塩', '醤油']})
+    aliases = app.ReceiptAliases(tmp_path / 'aliases.json')
+    assert app.parse_receipt_text('減塩しょうゆ 298', df, aliases)[0]['name'] == '塩'
+    
+    aliases.learn('減塩しょうゆ', '醤油')
+    item = app.parse_receipt_text('減塩しょうゆ 298', df, aliases)[0]
+    assert item['name'] == '醤油'
+    assert item['match'] == 'alias'
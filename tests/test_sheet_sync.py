@@ -0,0 +1,33 @@
+"""SQLiteからGoogle Sheetsへの同期のテスト"""
+import app
+from fake_sheet import FakeWorksheet
+
+HEADER = ['項目名', 'カテゴリ', '予備数', '補充しきい値', '在庫数', 'アイコン', '賞味期限', 'メモ']
+ROWS = [
+    ['醤油', '調味料', 2, 1, 1, '🍶', '2026/12/01', '濃口'],
+    ['塩', '調味料', 1, 1, 1, '🧂', '', '瓶'],
+]
+
+def make_sync(tmp_path):
+    sheet = FakeWorksheet([])
+    sheet.values = [list(HEADER)] + [list(row) for row in ROWS]
+    store = app.SQLiteStore(str(tmp_path / 'inventory.db'))
+    store.write(None, [list(HEADER)] + [list(row) for row in ROWS])
+    return sheet, store, app.SheetSync(store, lambda: sheet, 3600)
+
+def test_sync_writes_to_sheet_columns(tmp_path):
+    sheet, store, sync = make_sync(tmp_path)
+    store.adjust('予備数', {'醤油': 3})
+    sync.sync()
+    assert sheet.values[0] == HEADER
+    assert sheet.values[1] == ['醤油', '調味料', 5, 1, 1, '🍶', '2026/12/01', '濃口']
+    assert sheet.calls['clear'] == 0
+    sync.close()
+
+def test_rewrite_keeps_sheet_only_columns(tmp_path):
+    sheet, store, sync = make_sync(tmp_path)
+    values = app.records_to_values(store.fetch_records())
+    store.write(values, [values[0], values[2]])  # 醤油の行を削除
+    sync.sync()
+    assert sheet.values == [HEADER, ['塩', '調味料', 1, 1, 1, '🧂', '', '瓶']]
+    sync.close()
@@ -0,0 +1,35 @@
+"""共有キャッシュ(SnapshotCache)のテスト"""
+import app
+from fake_sheet import FakeWorksheet
+
+RECORDS = [
+    {'アイコン': '🍶', '項目名': '醤油', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 2, '補充しきい値': 1, '賞味期限': ''},
+    {'アイコン': '🧂', '項目名': '塩', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 1, '補充しきい値': 1, '賞味期限': ''},
+]
+
+def test_names_revision_ignores_stock_changes():
+    cache = app.SnapshotCache(30)
+    cache.get_records(app.GoogleSheetStore(FakeWorksheet(RECORDS)))
+    revision, names_revision = cache.revision, cache.names_revision
+    
+    cache.replace([{**RECORDS[0], '予備数': 3}, RECORDS[1]])
+    assert cache.revision > revision
+    assert cache.names_revision == names_revision
+    
+    cache.replace([{**RECORDS[0], '予備数': 3}, {**RECORDS[1], 'カテゴリ': '食料品'}])
+    assert cache.names_revision == cache.revision
+    
+    cache.replace([{**RECORDS[0], '予備数': 3}])
+    assert cache.names_revision == cache.revision
+
+def test_get_records_returns_matching_revision():
+    cache = app.SnapshotCache(30)
+    store = app.GoogleSheetStore(FakeWorksheet(RECORDS))
+    records, revision, names_revision = cache.get_records(store)
+    assert (revision, names_revision) == (cache.revision, cache.names_revision)
+    
+    cache.replace([{**RECORDS[0], '予備数': 3}, RECORDS[1]])
+    assert records[0]['予備数'] == 2
+    records, revision, _ = cache.get_records(store)
+    assert records[0]['予備数'] == 3
+    assert cache.changes_since(revision) == set()
@@ -0,0 +1,32 @@
+"""世帯ごとのTenantの管理のテスト"""
+import time
+import types
+
+import app
+
+def fake_tenant(last_used):
+    tenant = types.SimpleNamespace(busy=False, last_used=last_used, closed=False)
+    tenant.close = lambda: setattr(tenant, 'closed', True)
+    return tenant
+
+def test_idle_tenant_is_evicted_below_limit():
+    configs = {'a': {'sheet_url': 'a', 'worksheet': 'a'}, 'b': {'sheet_url': 'b', 'worksheet': 'b'}}
+    registry = app.TenantRegistry(configs, max_tenants=8, idle_seconds=60)
+    now = time.monotonic()
+    idle, active = fake_tenant(now - 120), fake_tenant(now)
+    registry._tenants.update(a=idle, b=active)
+    
+    assert registry.get('b') is active
+    assert idle.closed
+    assert list(registry._tenants) == ['b']
+
+def test_busy_tenant_is_kept():
+    configs = {'a': {'sheet_url': 'a', 'worksheet': 'a'}, 'b': {'sheet_url': 'b', 'worksheet': 'b'}}
+    registry = app.TenantRegistry(configs, max_tenants=8, idle_seconds=60)
+    now = time.monotonic()
+    busy = fake_tenant(now - 120)
+    busy.busy = True
+    registry._tenants.update(a=busy, b=fake_tenant(now))
+    
+    registry.get('b')
+    assert not busy.closed
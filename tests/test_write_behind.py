@@ -0,0 +1,109 @@
+"""バックグラウンド書き込み(WriteBehindStore)のテスト"""
+import threading
+import time
+import types
+
+import app
+from fake_sheet import FakeWorksheet
+
+RECORDS = [
+    {'アイコン': '🍶', '項目名': '醤油', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 2, '補充しきい値': 1, '賞味期限': ''},
+    {'アイコン': '🧂', '項目名': '塩', 'カテゴリ': '調味料', '在庫数': 1, '予備数': 1, '補充しきい値': 1, '賞味期限': ''},
+]
+STOCK = app.INVENTORY_COLUMNS.index('予備数')
+
+class SlowWorksheet(FakeWorksheet):
+    """読み込み・書き込みに時間がかかり、指定回数だけ429を返すワークシート"""
+    
+    def __init__(self, records, read_delay=0.0, write_delay=0.0, failures=0):
+        super().__init__(records)
+        self.read_delay = read_delay
+        self.write_delay = write_delay
+        self.failures = failures
+    
+    def get_all_records(self):
+        records = super().get_all_records()  # 読み始めた時点の内容
+        time.sleep(self.read_delay)
+        return records
+    
+    def batch_update(self, data):
+        time.sleep(self.write_delay)
+        if self.failures:
+            self.failures -= 1
+            error = Exception("Quota exceeded")
+            error.response = types.SimpleNamespace(status_code=429)
+            raise error
+        return super().batch_update(data)
+
+def wait_until_flushed(store, timeout=5):
+    deadline = time.monotonic() + timeout
+    while store.depth and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.depth == 0
+
+def edited(values, row, value):
+    new_values = [list(r) for r in values]
+    new_values[row][STOCK] = value
+    return new_values
+
+def test_fetch_overlapping_completed_push_keeps_edit():
+    sheet = SlowWorksheet(RECORDS, read_delay=0.3, write_delay=0.1)
+    store = app.WriteBehindStore(app.GoogleSheetStore(sheet), base_delay=0.01)
+    values = app.records_to_values(RECORDS)
+    store.write(values, edited(values, 1, 5))
+    time.sleep(0.02)  # 書き込み中に読み込みを始め、読み込み中に書き込みが完了する
+    
+    assert store.fetch_records()[0]['予備数'] == 5
+    wait_until_flushed(store)
+    assert sheet.values[1][STOCK] == 5
+    store.close()
+
+def test_rate_limited_push_is_requeued_without_losing_newer_edits():
+    sheet = SlowWorksheet(RECORDS, write_delay=0.05, failures=2)
+    store = app.WriteBehindStore(app.GoogleSheetStore(sheet), base_delay=0.01)
+    values = app.records_to_values(RECORDS)
+    first = edited(values, 1, 5)
+    store.write(values, first)
+    time.sleep(0.02)
+    store.write(first, edited(first, 2, 7))  # 失敗した書き込みの再試行待ちに後から積んだ編集
+    
+    wait_until_flushed(store)
+    assert sheet.failures == 0
+    assert sheet.values[1][STOCK] == 5
+    assert sheet.values[2][STOCK] == 7
+    assert store.last_error is None
+    assert store.fetch_records()[1]['予備数'] == 7
+    store.close()
+
+def test_write_after_close_reaches_sheet():
+    sheet = FakeWorksheet(RECORDS)
+    store = app.WriteBehindStore(app.GoogleSheetStore(sheet), base_delay=0.01)
+    values = app.records_to_values(RECORDS)
+    first = edited(values, 1, 5)
+    store.write(values, first)
+    store.close()
+    wait_until_flushed(store)
+    time.sleep(0.05)
+    
+    store.write(first, edited(first, 1, 9))
+    assert sheet.values[1][STOCK] == 9
+    assert store.fetch_records()[0]['予備数'] == 9
+
+def test_concurrent_adjust_stock_deltas_are_all_applied():
+    sheet = FakeWorksheet(RECORDS)
+    store = app.WriteBehindStore(app.GoogleSheetStore(sheet), base_delay=0.01)
+    tenant = types.SimpleNamespace(store=store, cache=app.SnapshotCache(30), lock=threading.Lock())
+    
+    threads = [
+        threading.Thread(target=app.adjust_stock, args=(tenant, {'醤油': 1, '塩': 2}))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    wait_until_flushed(store)
+    assert sheet.values[1][STOCK] == 2 + 20
+    assert sheet.values[2][STOCK] == 1 + 40
+    store.close()